@@ -0,0 +1,278 @@
+"""
+Offline analytics over stored session summaries (data/summaries/*.json).
+
+Aggregates, per persona and UTC day: risk flag counts and the most common
+emotions_themes, stressors and coping_strategies_discussed. Only youth-wellness
+summaries are counted (other personas' summaries have a different schema).
+Only the "meta" and "summary" sections of each file are decoded; the
+transcript is never parsed.
+
+    python analytics.py                  # incremental: only files not seen before
+    python analytics.py --full           # rebuild from scratch
+    python analytics.py --since 2025-01-01 --top 15 --format json
+    python analytics.py --persona youthguide
+
+Standalone on purpose: it does not import common.py, so it needs no credentials.
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SUMMARIES_DIR = os.path.join(BASE_DIR, "data", "summaries")
+STATE_PATH = os.path.join(BASE_DIR, "data", "analytics", "state.json")
+
+RISK_FLAGS = (
+    "mentions_self_harm",
+    "mentions_harming_others",
+    "mentions_abuse_or_unsafe",
+    "urgent_support_recommended",
+)
+LIST_FIELDS = ("emotions_themes", "stressors", "coping_strategies_discussed")
+
+# summarize_and_store writes indent=2, so top-level keys sit at two spaces
+META_MARKER = '\n  "meta": '
+SUMMARY_MARKER = '\n  "summary": '
+# Summaries written before meta recorded the persona / summary kind
+UNKNOWN_PERSONA = "unknown"
+WELLNESS_KIND = "wellness"
+READ_CHUNK = 64 * 1024
+
+
+# ---------- Per-file work (runs in worker processes) ----------
+def read_meta_and_summary(path: str):
+    """
+    Decode only the top-level "meta" and "summary" values (meta is written
+    first), reading as little of the file as needed. Returns (meta, summary).
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            buf += chunk
+            idx = buf.find(SUMMARY_MARKER)
+            if idx != -1:
+                try:
+                    value, _ = decoder.raw_decode(buf, idx + len(SUMMARY_MARKER))
+                    meta_idx = buf.find(META_MARKER, 0, idx)
+                    meta = decoder.raw_decode(buf, meta_idx + len(META_MARKER))[0] if meta_idx != -1 else {}
+                    return meta, value
+                except json.JSONDecodeError:
+                    if not chunk:
+                        break  # truncated/corrupt
+                    continue   # value spans past the buffer; read more
+            if not chunk:
+                break
+    # Not written by summarize_and_store (e.g. compact JSON): parse it whole
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("meta") or {}, data.get("summary")
+
+
+def day_of(path: str) -> str:
+    """UTC day from the '<client>_<YYYYmmddTHHMMSSZ>.json' filename, else the file mtime."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    try:
+        ts = datetime.strptime(stem.rsplit("_", 1)[-1], "%Y%m%dT%H%M%SZ")
+        return ts.strftime("%Y-%m-%d")
+    except ValueError:
+        return datetime.fromtimestamp(os.path.getmtime(path), timezone.utc).strftime("%Y-%m-%d")
+
+
+def empty_day() -> dict:
+    return {
+        "files": 0,
+        "unparsed": 0,
+        "risk_flags": {flag: 0 for flag in RISK_FLAGS},
+        **{name: {} for name in LIST_FIELDS},
+    }
+
+
+def _norm(item) -> str:
+    return " ".join(str(item).split()).lower()
+
+
+def aggregate_files(paths: list):
+    """
+    Worker entry point: (persona -> day -> partial aggregate, names to retry)
+    for a batch of files. A file that cannot be read or decoded (e.g. still
+    being written) is left out entirely so the next run picks it up again.
+    """
+    personas = {}
+    retry = []
+    for path in paths:
+        try:
+            meta, summary = read_meta_and_summary(path)
+        except (OSError, ValueError):
+            retry.append(os.path.basename(path))
+            continue
+        if not isinstance(meta, dict):
+            meta = {}
+        if meta.get("summary_kind", WELLNESS_KIND) != WELLNESS_KIND:
+            continue
+        days = personas.setdefault(meta.get("persona") or UNKNOWN_PERSONA, {})
+        day = days.setdefault(day_of(path), empty_day())
+        day["files"] += 1
+        if not isinstance(summary, dict) or "raw" in summary:
+            day["unparsed"] += 1
+            continue
+
+        flags = summary.get("risk_flags") or {}
+        for flag in RISK_FLAGS:
+            if flags.get(flag) is True:
+                day["risk_flags"][flag] += 1
+
+        for name in LIST_FIELDS:
+            counts = day[name]
+            for item in summary.get(name) or []:
+                key = _norm(item)
+                if key:
+                    counts[key] = counts.get(key, 0) + 1
+    return personas, retry
+
+
+# ---------- Merging / state ----------
+def merge_days(into: dict, other: dict):
+    for day, agg in other.items():
+        target = into.setdefault(day, empty_day())
+        target["files"] += agg["files"]
+        target["unparsed"] += agg["unparsed"]
+        for flag in RISK_FLAGS:
+            target["risk_flags"][flag] += agg["risk_flags"].get(flag, 0)
+        for name in LIST_FIELDS:
+            counts = Counter(target[name])
+            counts.update(agg[name])
+            target[name] = dict(counts)
+
+
+def empty_state() -> dict:
+    return {"processed": [], "personas": {}}
+
+
+def load_state(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return empty_state()
+    if "personas" not in state:
+        # State from before per-persona aggregates: rebuild it
+        print("Analytics state predates per-persona aggregates; rebuilding.", file=sys.stderr)
+        return empty_state()
+    return state
+
+
+def save_state(path: str, state: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def batched(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def run(summaries_dir: str, state_path: str, full: bool = False, workers=None, batch_size: int = 200) -> dict:
+    """Fold every not-yet-processed summary file into the stored state and return it."""
+    state = empty_state() if full else load_state(state_path)
+    seen = set(state["processed"])
+
+    try:
+        names = sorted(n for n in os.listdir(summaries_dir) if n.endswith(".json"))
+    except FileNotFoundError:
+        names = []
+    new_names = [n for n in names if n not in seen]
+    paths = [os.path.join(summaries_dir, n) for n in new_names]
+
+    retry = set()
+    if paths:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for partial, failed in pool.map(aggregate_files, batched(paths, batch_size)):
+                for persona, days in partial.items():
+                    merge_days(state["personas"].setdefault(persona, {}), days)
+                retry.update(failed)
+        state["processed"] = sorted(seen.union(n for n in new_names if n not in retry))
+        save_state(state_path, state)
+
+    print(f"Processed {len(paths) - len(retry)} new file(s); {len(state['processed'])} total.", file=sys.stderr)
+    if retry:
+        print(f"{len(retry)} file(s) could not be read yet; they will be retried next run.", file=sys.stderr)
+    return state
+
+
+# ---------- Output ----------
+def select_days(personas: dict, since=None, until=None, persona=None) -> dict:
+    """Day -> aggregate over the chosen persona (default: all of them)."""
+    days = {}
+    for name, persona_days in personas.items():
+        if persona is not None and name != persona:
+            continue
+        merge_days(days, {d: agg for d, agg in persona_days.items()
+                          if (since is None or d >= since) and (until is None or d <= until)})
+    return dict(sorted(days.items()))
+
+
+def top_items(days: dict, name: str, n: int) -> list:
+    counts = Counter()
+    for agg in days.values():
+        counts.update(agg[name])
+    return counts.most_common(n)
+
+
+def render_table(days: dict, top: int) -> str:
+    lines = []
+    header = ["day", "files", "unparsed", "self_harm", "harm_others", "abuse_unsafe", "urgent"]
+    rows = [[d, agg["files"], agg["unparsed"], *(agg["risk_flags"][f] for f in RISK_FLAGS)]
+            for d, agg in days.items()]
+    widths = [max(len(str(x)) for x in col) for col in zip(header, *rows)]
+    for row in [header] + rows:
+        lines.append("  ".join(str(v).rjust(w) if i else str(v).ljust(w)
+                               for i, (v, w) in enumerate(zip(row, widths))))
+
+    for name in LIST_FIELDS:
+        items = top_items(days, name, top)
+        lines.append("")
+        lines.append(f"top {name}")
+        width = max((len(k) for k, _ in items), default=0)
+        for key, count in items:
+            lines.append(f"  {key.ljust(width)}  {count}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate stored YouthGuide session summaries.")
+    parser.add_argument("--summaries-dir", default=SUMMARIES_DIR)
+    parser.add_argument("--state", default=STATE_PATH, help="incremental state file")
+    parser.add_argument("--full", action="store_true", help="ignore saved state and reprocess every file")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--since", help="first day to report, YYYY-MM-DD")
+    parser.add_argument("--until", help="last day to report, YYYY-MM-DD")
+    parser.add_argument("--persona", help="only this persona's summaries (default: all)")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--format", choices=("table", "json"), default="table")
+    args = parser.parse_args(argv)
+
+    state = run(args.summaries_dir, args.state, full=args.full, workers=args.workers)
+    days = select_days(state["personas"], args.since, args.until, args.persona)
+
+    if args.format == "json":
+        out = {
+            "days": {d: {"files": a["files"], "unparsed": a["unparsed"], "risk_flags": a["risk_flags"]}
+                     for d, a in days.items()},
+            **{f"top_{name}": top_items(days, name, args.top) for name in LIST_FIELDS},
+        }
+        print(json.dumps(out, ensure_ascii=False, separators=(",", ":")))
+    else:
+        print(render_table(days, args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ class AudioClient {
         this.reconnectAttempts = 0;
         this.maxReconnectAttempts = 3;
         this.sessionId = null;
+        this.sessionKey = null; // stable server-side session key, sent back on reconnect
 
         // Callbacks
         this.onReady = () => {};
@@ -44,6 +45,16 @@ class AudioClient {
         window.existingAudioContexts = window.existingAudioContexts || [];
     }
     
+    // Server URL, with ?session=<key> once the server has assigned one
+    buildUrl() {
+        if (!this.sessionKey) {
+            return this.serverUrl;
+        }
+        const url = new URL(this.serverUrl);
+        url.searchParams.set('session', this.sessionKey);
+        return url.toString();
+    }
+
     // Connect to the WebSocket server
     async connect() {
         // Close existing connection if any
@@ -62,7 +73,7 @@ class AudioClient {
 
         return new Promise((resolve, reject) => {
             try {
-                this.ws = new WebSocket(this.serverUrl);
+                this.ws = new WebSocket(this.buildUrl());
 
                 const connectionTimeout = setTimeout(() => {
                     if (!this.isConnected) {
@@ -131,6 +142,10 @@ class AudioClient {
                             // Handle server error
                             this.onError(message.data);
                         }
+                        else if (message.type === 'session_key') {
+                            // Remember the key so a reconnect restores this session
+                            this.sessionKey = message.data;
+                        }
                         else if (message.type === 'session_id') {
                             // Handle session ID
                             console.log('Received session ID message:', message);
@@ -405,6 +420,7 @@ class AudioClient {
 
         // Reset session ID
         this.sessionId = null;
+        this.sessionKey = null;
 
         // Stop any audio playback
         this.interrupt();
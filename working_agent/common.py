@@ -3,16 +3,18 @@ import json
 import base64
 import logging
 import websockets
-import traceback
 from websockets.exceptions import ConnectionClosed
 import os
+from urllib.parse import urlsplit, parse_qsl
+
+from logging_setup import configure_logging, bind_log_context, reset_log_context
 
 # --- Auth Imports ---
 from google.oauth2 import service_account
 from google import genai
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Set up logging: queued, structured, with per-connection context (see logging_setup.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Constants
@@ -64,36 +66,32 @@ def get_order_status(order_id):
     #else:
     #    return "order not found"
 
-    print(order_id)
-
     # Generate some random data for other order IDs
     import random
     statuses = ["processing", "shipped", "delivered"]
     shipment_methods = ["standard", "express", "next day", "international"]
 
-    # Generate random data based on the order ID to ensure consistency
+    # Generate random data based on the order ID to ensure consistency.
+    # Use a local RNG so concurrent calls never touch the global random state.
     seed = sum(ord(c) for c in str(order_id))
-    random.seed(seed)
+    rng = random.Random(seed)
 
-    status = random.choice(statuses)
-    shipment = random.choice(shipment_methods)
-    order_date = "2024-05-" + str(random.randint(12, 28)).zfill(2)
+    status = rng.choice(statuses)
+    shipment = rng.choice(shipment_methods)
+    order_date = "2024-05-" + str(rng.randint(12, 28)).zfill(2)
 
     estimated_delivery = None
     shipped_date = None
     delivered_date = None
 
     if status == "processing":
-        estimated_delivery = "2024-06-" + str(random.randint(1, 15)).zfill(2)
+        estimated_delivery = "2024-06-" + str(rng.randint(1, 15)).zfill(2)
     elif status == "shipped":
-        shipped_date = "2024-05-" + str(random.randint(1, 28)).zfill(2)
-        estimated_delivery = "2024-06-" + str(random.randint(1, 15)).zfill(2)
+        shipped_date = "2024-05-" + str(rng.randint(1, 28)).zfill(2)
+        estimated_delivery = "2024-06-" + str(rng.randint(1, 15)).zfill(2)
     elif status == "delivered":
-        shipped_date = "2024-05-" + str(random.randint(1, 20)).zfill(2)
-        delivered_date = "2024-05-" + str(random.randint(21, 28)).zfill(2)
-
-    # Reset random seed
-    random.seed()
+        shipped_date = "2024-05-" + str(rng.randint(1, 20)).zfill(2)
+        delivered_date = "2024-05-" + str(rng.randint(21, 28)).zfill(2)
 
     result = {
         "order_id": order_id,
@@ -133,6 +131,15 @@ you help with the following
 - if the users asks about the BOKHYLLA Stor ask him what he wants to know. If he asks about if they are adjustable. say yes you can move them to different heights to accommodate items of various sizes. Each shelf rests on small pegs that can be repositioned in the pre-drilled holes along the sides of the bookcase.
 """
 
+def connection_path(websocket) -> str:
+    """Request path of the WebSocket handshake, query string included."""
+    request = getattr(websocket, "request", None)  # websockets >= 13
+    return getattr(request, "path", None) or getattr(websocket, "path", None) or ""
+
+def connection_params(websocket) -> dict:
+    """Query-string parameters of the WebSocket handshake, e.g. ws://host:8765/?mode=text"""
+    return dict(parse_qsl(urlsplit(connection_path(websocket)).query))
+
 # Base WebSocket server class that handles common functionality
 class BaseWebSocketServer:
     def __init__(self, host="0.0.0.0", port=8765):
@@ -148,6 +155,8 @@ class BaseWebSocketServer:
     async def handle_client(self, websocket):
         """Handle a new WebSocket client connection"""
         client_id = id(websocket)
+        # Every record logged while serving this client carries its id
+        log_token = bind_log_context(client_id=client_id)
         logger.info(f"New client connected: {client_id}")
 
         # Send ready message to client
@@ -159,12 +168,12 @@ class BaseWebSocketServer:
         except ConnectionClosed:
             logger.info(f"Client disconnected: {client_id}")
         except Exception as e:
-            logger.error(f"Error handling client {client_id}: {e}")
-            logger.error(traceback.format_exc())
+            logger.exception(f"Error handling client {client_id}: {e}")
         finally:
             # Clean up if needed
             if client_id in self.active_clients:
                 del self.active_clients[client_id]
+            reset_log_context(log_token)
 
     async def process_audio(self, websocket, client_id):
         """
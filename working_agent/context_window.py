@@ -0,0 +1,101 @@
+from dataclasses import dataclass, fields
+from typing import Optional
+
+from google.genai import types
+
+from common import SEND_SAMPLE_RATE, RECEIVE_SAMPLE_RATE
+
+# Rough Gemini token rates used when the server has not reported usage yet
+AUDIO_TOKENS_PER_SECOND = 32
+CHARS_PER_TEXT_TOKEN = 4
+BYTES_PER_SAMPLE = 2  # 16-bit PCM
+# Share of rollover_tokens at which the recap for the next session starts
+# being written, so it is ready by the time the rollover is due
+ROLLOVER_PREPARE_FRACTION = 0.85
+
+
+class SessionRollover(Exception):
+    """Raised inside a Live session to close it and continue in a fresh, summary-seeded one."""
+
+
+@dataclass(frozen=True)
+class ContextPolicy:
+    """
+    How a long conversation is kept within the model's context window.
+    Configured through the "context" object in live_settings.json.
+    """
+    compression: bool = True
+    compression_trigger_tokens: int = 32000
+    sliding_window_target_tokens: int = 16000
+    rollover_tokens: int = 128000     # tokens processed by one session, before compression; 0 disables
+    rollover_summary_words: int = 150
+
+    @classmethod
+    def from_settings(cls, settings: Optional[dict]) -> "ContextPolicy":
+        settings = settings or {}
+        known = {f.name for f in fields(cls)}
+        unknown = set(settings) - known
+        if unknown:
+            raise ValueError(f"Unknown context settings: {sorted(unknown)}")
+        return cls(**settings)
+
+    def compression_config(self) -> Optional[types.ContextWindowCompressionConfig]:
+        if not self.compression:
+            return None
+        return types.ContextWindowCompressionConfig(
+            trigger_tokens=self.compression_trigger_tokens,
+            sliding_window=types.SlidingWindow(target_tokens=self.sliding_window_target_tokens),
+        )
+
+
+class ContextTracker:
+    """
+    Server-side estimate of how many tokens a Live session currently holds
+    (`tokens`, kept in step with compression) and how many it has processed
+    in total (`total_tokens`, which compression never lowers and which drives
+    rollover). Usage reported by the server replaces the window estimate; in
+    between, audio and text are counted at approximate rates.
+    """
+
+    def __init__(self, policy: ContextPolicy):
+        self.policy = policy
+        self.tokens = 0
+        self.total_tokens = 0
+
+    def reset(self, seed_tokens: int = 0):
+        self.tokens = seed_tokens
+        self.total_tokens = seed_tokens
+
+    def _add(self, n: float):
+        self.tokens += int(n)
+        self.total_tokens += int(n)
+        p = self.policy
+        if p.compression and self.tokens > p.compression_trigger_tokens:
+            # Mirror the server's sliding window so the estimate does not run away
+            self.tokens = p.sliding_window_target_tokens
+
+    def add_text(self, text: str):
+        self._add(len(text or "") / CHARS_PER_TEXT_TOKEN)
+
+    def add_input_audio(self, nbytes: int):
+        self._add(nbytes / (BYTES_PER_SAMPLE * SEND_SAMPLE_RATE) * AUDIO_TOKENS_PER_SECOND)
+
+    def add_output_audio(self, nbytes: int):
+        self._add(nbytes / (BYTES_PER_SAMPLE * RECEIVE_SAMPLE_RATE) * AUDIO_TOKENS_PER_SECOND)
+
+    def observe_usage(self, usage):
+        """Take the server's own count when a response carries usage metadata."""
+        if usage is None:
+            return
+        prompt = getattr(usage, "prompt_token_count", None) or 0
+        response = getattr(usage, "response_token_count", None) or 0
+        if prompt or response:
+            self.tokens = prompt + response
+            self.total_tokens = max(self.total_tokens, self.tokens)
+
+    def should_prepare_rollover(self) -> bool:
+        return (bool(self.policy.rollover_tokens)
+                and self.total_tokens >= self.policy.rollover_tokens * ROLLOVER_PREPARE_FRACTION)
+
+    def should_rollover(self) -> bool:
+        return bool(self.policy.rollover_tokens) and self.total_tokens >= self.policy.rollover_tokens
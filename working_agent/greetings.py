@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from google import genai
+from google.genai import types
+
+from common import logger, PROJECT_ID, LOCATION, RECEIVE_SAMPLE_RATE
+
+GREETINGS_DIR = os.path.join(os.path.dirname(__file__), "data", "greetings")
+# ~0.25s of 16-bit mono PCM at RECEIVE_SAMPLE_RATE per frame
+FRAME_BYTES = RECEIVE_SAMPLE_RATE // 4 * 2
+GREETING_PROMPT = "(The user has just joined the conversation. Greet them now, as your instructions describe.)"
+# "?lang=" ends up in a file name, so only plain language tags (en, sv, pt-BR) are accepted
+LANG_RE = re.compile(r"^[a-z]{2,3}(-[A-Za-z]{2,4})?$")
+DEFAULT_LANG = "en"
+# How often the clip directory is re-listed to pick up new or regenerated greetings
+RESCAN_INTERVAL_S = 30.0
+
+
+@dataclass(frozen=True)
+class Greeting:
+    text: str
+    frames: tuple  # JSON audio frames, encoded once at load time
+
+    def instruction(self) -> str:
+        """Tells the Live session the greeting has already been played."""
+        return (
+            "You have ALREADY greeted the user out loud with exactly these words: "
+            f"\"{self.text}\". Do not greet or introduce yourself again; wait for the user "
+            "to speak and continue the conversation from there."
+        )
+
+
+def greeting_lang(lang) -> str:
+    """`lang` if it is a plain language tag, else DEFAULT_LANG."""
+    if isinstance(lang, str) and LANG_RE.match(lang):
+        return lang
+    return DEFAULT_LANG
+
+
+def greeting_paths(persona: str, voice: str, lang: str, out_dir: str = GREETINGS_DIR):
+    stem = os.path.join(out_dir, f"{persona}_{voice}_{lang}".lower())
+    return stem + ".pcm", stem + ".txt"
+
+
+def _load(persona: str, voice: str, lang: str, out_dir: str = GREETINGS_DIR) -> Optional[Greeting]:
+    pcm_path, text_path = greeting_paths(persona, voice, lang, out_dir)
+    try:
+        with open(pcm_path, "rb") as f:
+            pcm = f.read()
+        with open(text_path, "r", encoding="utf-8") as f:
+            text = f.read().strip()
+    except FileNotFoundError:
+        return None
+    frames = tuple(
+        json.dumps({"type": "audio", "data": base64.b64encode(pcm[i:i + FRAME_BYTES]).decode("utf-8")})
+        for i in range(0, len(pcm), FRAME_BYTES)
+    )
+    logger.info(f"Loaded greeting clip {os.path.basename(pcm_path)} ({len(pcm)} bytes)")
+    return Greeting(text=text, frames=frames)
+
+
+def _available_clips(out_dir: str = GREETINGS_DIR) -> dict:
+    """File stem -> (clip mtime, transcript mtime), for stems that have both files."""
+    try:
+        mtimes = {entry.name: entry.stat().st_mtime_ns for entry in os.scandir(out_dir)}
+    except FileNotFoundError:
+        return {}
+    return {
+        name[:-4]: (mtime, mtimes[name[:-4] + ".txt"])
+        for name, mtime in mtimes.items()
+        if name.endswith(".pcm") and name[:-4] + ".txt" in mtimes
+    }
+
+
+class GreetingCache:
+    """
+    In-memory greeting clips per (persona, voice, language). Only combinations
+    with a clip on disk are ever loaded or cached, so arbitrary client input
+    cannot grow the cache. The directory listing is refreshed periodically and
+    on invalidate() (a config reload); a clip whose files changed is reloaded.
+    """
+
+    def __init__(self, out_dir: str = GREETINGS_DIR):
+        self.out_dir = out_dir
+        self._cache = {}      # (persona, voice, lang) -> (file mtimes, Optional[Greeting])
+        self._available = {}  # file stem -> file mtimes
+        self._scanned_at = None
+
+    async def get(self, persona: str, voice: str, lang: str) -> Optional[Greeting]:
+        now = time.monotonic()
+        if self._scanned_at is None or now - self._scanned_at >= RESCAN_INTERVAL_S:
+            self._scanned_at = now
+            self._available = await asyncio.to_thread(_available_clips, self.out_dir)
+        stem = os.path.basename(greeting_paths(persona, voice, lang, self.out_dir)[0])[:-4]
+        mtimes = self._available.get(stem)
+        if mtimes is None:
+            return None
+        key = (persona, voice, lang)
+        cached = self._cache.get(key)
+        if cached is None or cached[0] != mtimes:
+            cached = (mtimes, await asyncio.to_thread(_load, persona, voice, lang, self.out_dir))
+            self._cache[key] = cached
+        return cached[1]
+
+    def invalidate(self):
+        """Drop loaded clips and re-list the directory on the next get (e.g. after a config reload)."""
+        self._cache.clear()
+        self._scanned_at = None
+
+
+# ---------- Offline generation ----------
+async def generate_greeting(persona: str, lang: str):
+    """Record one greeting from the Live model with the persona's current config."""
+    from live_config import LiveConfigStore, derive_config
+    from tool_runtime import build_default_runtime
+
+    live = LiveConfigStore(tool_runtime=build_default_runtime()).current(persona)
+    if live is None:
+        raise SystemExit(f"Unknown persona '{persona}'")
+    config = derive_config(live.config, extra_instruction=f"Speak in the language with code '{lang}'.")
+
+    client = genai.Client(vertexai=True, project=PROJECT_ID, location=LOCATION)
+    audio = bytearray()
+    text = []
+    async with client.aio.live.connect(model=live.model, config=config) as session:
+        await session.send_client_content(
+            turns=types.Content(role="user", parts=[types.Part(text=GREETING_PROMPT)]),
+            turn_complete=True,
+        )
+        async for response in session.receive():
+            content = response.server_content
+            if not content:
+                continue
+            if content.model_turn:
+                for part in content.model_turn.parts:
+                    if part.inline_data:
+                        audio.extend(part.inline_data.data)
+            if content.output_transcription and content.output_transcription.text:
+                text.append(content.output_transcription.text)
+            if content.turn_complete:
+                break
+
+    pcm_path, text_path = greeting_paths(persona, live.voice_name, lang)
+    os.makedirs(os.path.dirname(pcm_path), exist_ok=True)
+    with open(pcm_path, "wb") as f:
+        f.write(audio)
+    with open(text_path, "w", encoding="utf-8") as f:
+        f.write("".join(text).strip())
+    logger.info(f"Saved greeting ({len(audio)} bytes PCM @ {RECEIVE_SAMPLE_RATE} Hz) to {pcm_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate the cached greeting clip for a persona.")
+    parser.add_argument("--persona", default="youthguide")
+    parser.add_argument("--lang", default=DEFAULT_LANG)
+    args = parser.parse_args()
+    if not LANG_RE.match(args.lang):
+        parser.error(f"--lang must be a language tag like 'en' or 'pt-BR', got {args.lang!r}")
+    asyncio.run(generate_greeting(args.persona, args.lang))
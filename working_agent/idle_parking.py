@@ -0,0 +1,24 @@
+import array
+import os
+
+# Close the Live session after this many seconds with no speech and no model
+# output; the WebSocket stays open. 0 disables parking.
+IDLE_PARK_S = float(os.environ.get("IDLE_PARK_S", "120"))
+# Peak amplitude (16-bit PCM) above which an uplink frame counts as speech
+SPEECH_PEAK_THRESHOLD = int(os.environ.get("SPEECH_PEAK_THRESHOLD", "1200"))
+
+
+class SessionParked(Exception):
+    """Raised inside a Live session to close it until the user is active again."""
+
+
+def is_speech(pcm: bytes, threshold: int = SPEECH_PEAK_THRESHOLD) -> bool:
+    """
+    Cheap energy gate for 16-bit little-endian PCM: the client streams the mic
+    continuously, so silence still arrives as audio frames.
+    """
+    if len(pcm) < 2:
+        return False
+    samples = array.array("h")
+    samples.frombytes(pcm[: len(pcm) - (len(pcm) % 2)])
+    return max(max(samples), -min(samples)) >= threshold
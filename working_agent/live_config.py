@@ -0,0 +1,229 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from google.genai import types
+from google.genai.types import (
+    LiveConnectConfig,
+    SpeechConfig,
+    VoiceConfig,
+    PrebuiltVoiceConfig,
+)
+
+from common import logger, MODEL
+from context_window import ContextPolicy
+from metrics import metrics
+from personas import DEFAULT_PERSONA, SUMMARY_SPECS, PersonaSpec, SummarySpec, resolve_personas
+
+BASE_DIR = os.path.dirname(__file__)
+# Optional JSON overrides, e.g.
+# {"model": "...", "text_model": "...", "voice_name": "Kore", "context": {...}, "personas": {...}}
+SETTINGS_PATH = os.path.join(BASE_DIR, "live_settings.json")
+DEFAULT_INSTRUCTION = "You are a helpful AI assistant."
+# Native-audio models only answer in audio; text-only connections use a half-cascade Live model
+TEXT_MODEL = "gemini-2.0-flash-live-preview-04-09"
+RESPONSE_MODES = ("audio", "text")
+
+
+def read_text_file_best_effort(path: str) -> str:
+    # Try common encodings first; fall back to byte decode with replacement
+    tried = []
+    for enc in ("utf-8", "utf-8-sig", "cp1252", "latin-1"):
+        try:
+            with open(path, "r", encoding=enc) as f:
+                text = f.read()
+                logger.info(f"Loaded {os.path.basename(path)} using encoding: {enc}")
+                return text
+        except UnicodeDecodeError:
+            tried.append(enc)
+            continue
+        except FileNotFoundError:
+            raise
+    # Last resort: decode bytes with replacement so the server still boots
+    with open(path, "rb") as f:
+        raw = f.read()
+    logger.warning(f"Fell back to bytes decode with replacement. Tried encodings: {tried}")
+    return raw.decode("utf-8", errors="replace")
+
+
+def build_live_config(system_instruction: str, voice_name: str, tools=None,
+                      context_policy: Optional[ContextPolicy] = None,
+                      response_mode: str = "audio") -> LiveConnectConfig:
+    """
+    Build the LiveConnectConfig used for new Live sessions. response_mode="text"
+    drops speech output and audio transcription entirely.
+    """
+    context_policy = context_policy or ContextPolicy()
+    if response_mode == "text":
+        return LiveConnectConfig(
+            response_modalities=["TEXT"],
+            session_resumption=types.SessionResumptionConfig(handle=None),
+            system_instruction=system_instruction,
+            tools=list(tools or []),
+            context_window_compression=context_policy.compression_config(),
+        )
+    return LiveConnectConfig(
+        response_modalities=["AUDIO"],
+        output_audio_transcription={},
+        input_audio_transcription={},
+        speech_config=SpeechConfig(
+            voice_config=VoiceConfig(
+                prebuilt_voice_config=PrebuiltVoiceConfig(voice_name=voice_name)
+            )
+        ),
+        session_resumption=types.SessionResumptionConfig(handle=None),
+        system_instruction=system_instruction,
+        tools=list(tools or []),
+        context_window_compression=context_policy.compression_config(),
+    )
+
+
+def derive_config(config: LiveConnectConfig, extra_instruction: Optional[str] = None,
+                  handle: Optional[str] = None) -> LiveConnectConfig:
+    """
+    Per-session variant of a cached config: append to the system instruction
+    and/or resume from a session handle. The cached config is never mutated.
+    """
+    update = {}
+    if extra_instruction:
+        update["system_instruction"] = f"{config.system_instruction}\n\n{extra_instruction}"
+    if handle:
+        update["session_resumption"] = types.SessionResumptionConfig(handle=handle)
+    return config.model_copy(update=update) if update else config
+
+
+@dataclass(frozen=True)
+class LiveConfigSnapshot:
+    """One immutable generation of a persona's Live settings. Sessions hold on to the one they started with."""
+    version: int
+    persona: str
+    model: str
+    voice_name: str
+    system_instruction: str
+    context_policy: ContextPolicy
+    config: LiveConnectConfig = field(repr=False)
+    text_model: str = TEXT_MODEL
+    text_config: Optional[LiveConnectConfig] = field(default=None, repr=False)
+    summary: Optional[SummarySpec] = field(default=None, repr=False)
+    loaded_at: float = 0.0
+
+    def for_mode(self, response_mode: str):
+        """(model, config) for an "audio" or "text" connection."""
+        if response_mode == "text":
+            return self.text_model, self.text_config
+        return self.model, self.config
+
+
+def _file_signature(path: str):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+
+class LiveConfigStore:
+    """
+    Caches one LiveConfigSnapshot per persona and rebuilds them all when the
+    settings file or any persona's instruction file changes on disk. The whole
+    persona map is swapped in a single reference assignment, so readers always
+    see either the old or the new generation, never a mix.
+    """
+
+    def __init__(self, settings_path: str = SETTINGS_PATH, tool_runtime=None):
+        self.settings_path = settings_path
+        self.tool_runtime = tool_runtime
+        self._watched = [settings_path]
+        self._signature = None
+        self._version = 0
+        self._snapshots = {}
+        self.reload()
+
+    def current(self, persona: str = DEFAULT_PERSONA) -> Optional[LiveConfigSnapshot]:
+        """Snapshot for `persona`, or None if no such persona is configured."""
+        return self._snapshots.get(persona)
+
+    def personas(self) -> list:
+        return sorted(self._snapshots)
+
+    def _signatures(self):
+        return tuple(_file_signature(p) for p in self._watched)
+
+    def _load_settings(self) -> dict:
+        try:
+            with open(self.settings_path, "r", encoding="utf-8") as f:
+                settings = json.load(f)
+        except FileNotFoundError:
+            return {}
+        if not isinstance(settings, dict):
+            raise ValueError(f"{self.settings_path} must contain a JSON object")
+        return settings
+
+    def _instruction(self, spec: PersonaSpec) -> str:
+        if spec.instruction_path:
+            try:
+                return read_text_file_best_effort(spec.instruction_path)
+            except FileNotFoundError:
+                logger.error(f"Error: {os.path.basename(spec.instruction_path)} not found. Using a default instruction.")
+                return DEFAULT_INSTRUCTION
+        return spec.instruction_text or DEFAULT_INSTRUCTION
+
+    def _build(self, spec: PersonaSpec, version: int, settings: dict,
+               context_policy: ContextPolicy) -> LiveConfigSnapshot:
+        instruction = self._instruction(spec)
+        tools = self.tool_runtime.declarations(spec.tools) if self.tool_runtime else []
+        return LiveConfigSnapshot(
+            version=version,
+            persona=spec.name,
+            model=spec.model or settings.get("model") or MODEL,
+            voice_name=spec.voice_name,
+            system_instruction=instruction,
+            context_policy=context_policy,
+            config=build_live_config(instruction, spec.voice_name, tools, context_policy),
+            text_model=settings.get("text_model") or TEXT_MODEL,
+            text_config=build_live_config(instruction, spec.voice_name, tools, context_policy, "text"),
+            summary=SUMMARY_SPECS.get(spec.summary) if spec.summary else None,
+            loaded_at=time.time(),
+        )
+
+    def reload(self) -> dict:
+        """Read the sources and publish a new generation. Raises if the sources are invalid."""
+        settings = self._load_settings()
+        specs = resolve_personas(settings)
+        watched = [self.settings_path] + sorted({s.instruction_path for s in specs.values() if s.instruction_path})
+        signature = tuple(_file_signature(p) for p in watched)
+        context_policy = ContextPolicy.from_settings(settings.get("context"))
+
+        version = self._version + 1
+        snapshots = {name: self._build(spec, version, settings, context_policy) for name, spec in specs.items()}
+
+        self._snapshots = snapshots
+        self._version = version
+        self._watched = watched
+        self._signature = signature
+        metrics.set_gauge("live_config_version", version)
+        logger.info(f"Live config v{version} active (personas: {', '.join(sorted(snapshots))})")
+        return snapshots
+
+    def changed(self) -> bool:
+        return self._signatures() != self._signature
+
+    async def watch(self, interval_s: float = 2.0, on_reload: Optional[Callable[[], None]] = None):
+        """Poll the source files and rebuild off the event loop when they change."""
+        while True:
+            await asyncio.sleep(interval_s)
+            if not self.changed():
+                continue
+            try:
+                await asyncio.to_thread(self.reload)
+                metrics.incr("live_config_reloads")
+                if on_reload:
+                    on_reload()
+            except Exception as e:
+                # Keep serving the previous generation; retry only on the next edit
+                self._signature = self._signatures()
+                metrics.incr("live_config_reload_errors")
+                logger.error(f"Live config reload failed, keeping v{self._version}: {e}")
@@ -0,0 +1,155 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+# Per-connection fields attached to every record (client_id, session_handle, ...).
+# The dict is shared by all tasks of one connection, so updating it from one
+# task (e.g. a new session handle) is visible in the others.
+_log_context = contextvars.ContextVar("log_context", default=None)
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")          # "json" or "text"
+# Max records per sample key per connection per window; set 0 to disable sampling
+LOG_SAMPLE_LIMIT = int(os.environ.get("LOG_SAMPLE_LIMIT", "20"))
+LOG_SAMPLE_WINDOW_S = float(os.environ.get("LOG_SAMPLE_WINDOW_S", "60"))
+
+
+def bind_log_context(**fields):
+    """Start a fresh context for the current task and the tasks it spawns."""
+    return _log_context.set(dict(fields))
+
+
+def update_log_context(**fields):
+    """Add fields to the current connection's context (shared across its tasks)."""
+    ctx = _log_context.get()
+    if ctx is None:
+        bind_log_context(**fields)
+    else:
+        ctx.update(fields)
+
+
+def reset_log_context(token):
+    _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the current log context onto the record (runs on the caller's thread)."""
+
+    def filter(self, record):
+        ctx = _log_context.get()
+        record.ctx = dict(ctx) if ctx else {}
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Rate-limits records logged with extra={"sample": "<key>"}: at most `limit`
+    per key per connection (client_id from the log context) per window, so a
+    busy connection cannot use up another's budget. The first record after a
+    quiet window reports how many were dropped. Records without a sample key
+    always pass. Needs ContextFilter to run first.
+    """
+
+    MAX_BUCKETS = 4096  # above this, expired buckets are pruned
+
+    def __init__(self, limit: int, window_s: float):
+        super().__init__()
+        self.limit = limit
+        self.window_s = window_s
+        self._lock = threading.Lock()
+        self._buckets = {}  # (key, client_id) -> [window_start, count, dropped]
+
+    def _prune(self, now):
+        expired = [k for k, b in self._buckets.items() if now - b[0] >= self.window_s]
+        for k in expired:
+            del self._buckets[k]
+
+    def filter(self, record):
+        sample = getattr(record, "sample", None)
+        if sample is None or self.limit <= 0:
+            return True
+        key = (sample, getattr(record, "ctx", {}).get("client_id"))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None or now - bucket[0] >= self.window_s:
+                dropped = bucket[2] if bucket else 0
+                if bucket is None and len(self._buckets) >= self.MAX_BUCKETS:
+                    self._prune(now)
+                self._buckets[key] = [now, 1, 0]
+                if dropped:
+                    record.suppressed = dropped
+                return True
+            if bucket[1] < self.limit:
+                bucket[1] += 1
+                return True
+            bucket[2] += 1
+            return False
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "ctx", {}))
+        if getattr(record, "suppressed", None):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        ctx = getattr(record, "ctx", {})
+        if ctx:
+            line += " [" + " ".join(f"{k}={v}" for k, v in ctx.items()) + "]"
+        return line
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # Hand the record over untouched: message merging, traceback rendering and
+    # JSON encoding all happen on the writer thread instead of the event loop.
+    def prepare(self, record):
+        return record
+
+
+_listener = None
+
+
+def configure_logging():
+    """Route all logging through a queue drained by a background writer thread."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(TextFormatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(SamplingFilter(LOG_SAMPLE_LIMIT, LOG_SAMPLE_WINDOW_S))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict, deque
+
+logger = logging.getLogger("common")
+
+
+def percentile(values, q: float):
+    """Nearest-rank percentile of an iterable of numbers (q in 0..100). None if empty."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = max(0, min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+class Metrics:
+    """
+    Tiny in-process metrics registry: counters, gauges and windowed timings.
+    Safe to call from worker threads; all reads/writes are short and locked.
+    """
+
+    def __init__(self, window: int = 512):
+        self._lock = threading.Lock()
+        self._window = window
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self.timings = defaultdict(lambda: deque(maxlen=self._window))
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name: str, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def add_gauge(self, name: str, delta):
+        with self._lock:
+            self.gauges[name] = self.gauges.get(name, 0) + delta
+
+    def observe(self, name: str, value_ms: float):
+        with self._lock:
+            self.timings[name].append(value_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            timings = {k: list(v) for k, v in self.timings.items()}
+        return {
+            "counters": counters,
+            "gauges": gauges,
+            "timings_ms": {
+                k: {
+                    "count": len(v),
+                    "p50": percentile(v, 50),
+                    "p95": percentile(v, 95),
+                    "max": max(v) if v else None,
+                }
+                for k, v in timings.items()
+            },
+        }
+
+
+# Process-wide registry
+metrics = Metrics()
+
+
+async def log_metrics_periodically(interval_s: float = 60.0):
+    """Background task: dump a metrics snapshot to the log every interval."""
+    while True:
+        await asyncio.sleep(interval_s)
+        logger.info(f"Metrics: {json.dumps(metrics.snapshot(), default=str)}")
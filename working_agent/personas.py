@@ -0,0 +1,148 @@
+import os
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from typing import Optional
+
+from common import SYSTEM_INSTRUCTION as HEMMAFY_INSTRUCTION, VOICE_NAME
+
+BASE_DIR = os.path.dirname(__file__)
+DEFAULT_PERSONA = "youthguide"
+
+
+@dataclass(frozen=True)
+class SummarySpec:
+    """How summarize_and_store condenses one persona's conversations into a JSON file."""
+    kind: str
+    system_note: str
+    focus: str
+    fields: dict = field(default_factory=dict, hash=False)  # schema example, filled in by the model
+
+    def schema_hint(self, session_handle: Optional[str]) -> dict:
+        return {
+            "session_id": session_handle or "",
+            "generated_at_utc": datetime.now(timezone.utc).isoformat(),
+            "language": "auto",
+            **self.fields,
+        }
+
+
+SUMMARY_SPECS = {
+    # Youth wellness fields (non-clinical); analytics and returning-user profiles read these
+    "wellness": SummarySpec(
+        kind="wellness",
+        system_note=(
+            "You are YouthGuide, a supportive, empathetic AI mentor for young people. "
+            "Summarize the user's full conversation in a youth wellness context. "
+            "You must NOT provide any medical diagnosis. "
+            "Detect safety concerns and reflect them as flags only. "
+            "Return STRICT JSON only—no markdown, no code fences, no extra text."
+        ),
+        focus="Focus on the youth's wellness state and the core points discussed.",
+        fields={
+            "preferred_name": "",
+            "summary": "",
+            "main_points": [],
+            "emotions_themes": [],
+            "stressors": [],
+            "protective_factors": [],
+            "coping_strategies_discussed": [],
+            "goals_or_hopes": [],
+            "action_items_suggested": [],
+            "risk_flags": {
+                "mentions_self_harm": False,
+                "mentions_harming_others": False,
+                "mentions_abuse_or_unsafe": False,
+                "urgent_support_recommended": False
+            },
+            "suggestions_non_clinical": [],
+        },
+    ),
+    # Customer-support call notes
+    "support": SummarySpec(
+        kind="support",
+        system_note=(
+            "You summarize customer-support conversations for an online store. "
+            "Return STRICT JSON only—no markdown, no code fences, no extra text."
+        ),
+        focus="Focus on what the customer asked for and how it was resolved.",
+        fields={
+            "summary": "",
+            "customer_requests": [],
+            "order_ids": [],
+            "products_discussed": [],
+            "resolution": "",
+            "follow_up_needed": False,
+            "follow_up_actions": [],
+        },
+    ),
+}
+
+
+@dataclass(frozen=True)
+class PersonaSpec:
+    """
+    One assistant persona. The instruction comes from `instruction_path` (watched
+    for edits) or, if that is unset, from the inline `instruction_text`.
+    """
+    name: str
+    instruction_path: Optional[str] = None
+    instruction_text: Optional[str] = None
+    voice_name: str = VOICE_NAME
+    tools: tuple = ()          # names registered in the ToolRuntime
+    model: Optional[str] = None  # None = the store-wide Live model
+    summary: Optional[str] = "wellness"  # key of SUMMARY_SPECS; None = no summaries
+
+
+BUILTIN_PERSONAS = {
+    "youthguide": PersonaSpec(
+        name="youthguide",
+        instruction_path=os.path.join(BASE_DIR, "system_instruction.txt"),
+    ),
+    "hemmafy": PersonaSpec(
+        name="hemmafy",
+        instruction_text=HEMMAFY_INSTRUCTION,
+        tools=("get_order_status",),
+        summary="support",
+    ),
+}
+
+_SETTING_KEYS = {"instruction_file", "instruction_text", "voice_name", "tools", "model", "summary"}
+
+
+def resolve_personas(settings: dict) -> dict:
+    """
+    Built-in personas merged with the "personas" object of live_settings.json,
+    which may override fields of a built-in or define a new persona, e.g.
+    {"personas": {"hemmafy": {"voice_name": "Kore"}, "coach": {"instruction_file": "coach.txt"}}}
+    "summary" picks the summary kind from SUMMARY_SPECS, or null for none.
+    A top-level "voice_name" is the default for personas that do not set one.
+    """
+    default_voice = settings.get("voice_name")
+    personas = {
+        name: replace(spec, voice_name=default_voice) if default_voice else spec
+        for name, spec in BUILTIN_PERSONAS.items()
+    }
+    for name, overrides in (settings.get("personas") or {}).items():
+        unknown = set(overrides) - _SETTING_KEYS
+        if unknown:
+            raise ValueError(f"Unknown settings for persona '{name}': {sorted(unknown)}")
+        spec = personas.get(name) or PersonaSpec(name=name)
+        fields = {}
+        if "instruction_file" in overrides:
+            fields["instruction_path"] = os.path.join(BASE_DIR, overrides["instruction_file"])
+        if "instruction_text" in overrides:
+            fields["instruction_text"] = overrides["instruction_text"]
+            fields.setdefault("instruction_path", None)
+        if "voice_name" in overrides:
+            fields["voice_name"] = overrides["voice_name"]
+        if "tools" in overrides:
+            fields["tools"] = tuple(overrides["tools"])
+        if "model" in overrides:
+            fields["model"] = overrides["model"]
+        if "summary" in overrides:
+            if overrides["summary"] is not None and overrides["summary"] not in SUMMARY_SPECS:
+                raise ValueError(f"Unknown summary kind for persona '{name}': {overrides['summary']!r} "
+                                 f"(expected one of {sorted(SUMMARY_SPECS)} or null)")
+            fields["summary"] = overrides["summary"]
+        personas[name] = replace(spec, **fields)
+    return personas
@@ -2,16 +2,14 @@ import asyncio
 import json
 import base64
 import os
+import time
 from datetime import datetime, timezone
+from urllib.parse import urlsplit
 
 # Import Google Generative AI components
 from google import genai
 from google.genai import types
 from google.genai.types import (
-    LiveConnectConfig,
-    SpeechConfig,
-    VoiceConfig,
-    PrebuiltVoiceConfig,
     Tool,
     GoogleSearchRetrieval,
 )
@@ -22,51 +20,25 @@ from common import (
     logger,
     PROJECT_ID,
     LOCATION,
-    MODEL,
-    VOICE_NAME,
     SEND_SAMPLE_RATE,
-    SYSTEM_INSTRUCTION,
-    get_order_status,
+    connection_path,
+    connection_params,
 )
-
-# # --- System instruction loader (unchanged) ---
-# try:
-#     file_path = os.path.join(os.path.dirname(__file__), "system_instruction.txt")
-#     with open(file_path, 'r') as file:
-#         SYSTEM_INSTRUCTION = file.read()
-# except FileNotFoundError:
-#     logger.error("Error: system_instruction.txt not found. Using a default instruction.")
-#     SYSTEM_INSTRUCTION = "You are a helpful AI assistant."
-
-
-def read_text_file_best_effort(path: str) -> str:
-    # Try common encodings first; fall back to byte decode with replacement
-    tried = []
-    for enc in ("utf-8", "utf-8-sig", "cp1252", "latin-1"):
-        try:
-            with open(path, "r", encoding=enc) as f:
-                text = f.read()
-                logger.info(f"Loaded system_instruction.txt using encoding: {enc}")
-                return text
-        except UnicodeDecodeError:
-            tried.append(enc)
-            continue
-        except FileNotFoundError:
-            raise
-    # Last resort: decode bytes with replacement so the server still boots
-    with open(path, "rb") as f:
-        raw = f.read()
-    logger.warning(f"Fell back to bytes decode with replacement. Tried encodings: {tried}")
-    return raw.decode("utf-8", errors="replace")
-
-try:
-    file_path = os.path.join(os.path.dirname(__file__), "system_instruction.txt")
-    SYSTEM_INSTRUCTION = read_text_file_best_effort(file_path)
-except FileNotFoundError:
-    logger.error("Error: system_instruction.txt not found. Using a default instruction.")
-    SYSTEM_INSTRUCTION = "You are a helpful AI assistant."
-
-
+from logging_setup import update_log_context
+from live_config import LiveConfigStore, derive_config, RESPONSE_MODES
+from personas import DEFAULT_PERSONA
+from context_window import ContextTracker, SessionRollover
+from idle_parking import IDLE_PARK_S, SessionParked, is_speech
+from session_store import build_session_store
+from greetings import GreetingCache, greeting_lang
+from supervision import SupervisorHub, supervisor_authorized
+from user_tokens import verify_user_token
+from session_keys import issue_session_key, verify_session_key, session_ref
+from user_memory import UserMemory
+from summarizer_routing import SummarizerRouter, summarizer_candidates
+from tool_runtime import build_default_runtime
+from usage_accounting import UsageAccounting
+from metrics import metrics, log_metrics_periodically
 
 # Initialize Google client
 client = genai.Client(vertexai=True, project=PROJECT_ID, location=LOCATION)
@@ -76,20 +48,33 @@ google_search_tool = Tool(
     google_search_retrieval=GoogleSearchRetrieval()
 )
 
-# LiveAPI Configuration (unchanged)
-config = LiveConnectConfig(
-    response_modalities=["AUDIO"],
-    output_audio_transcription={},
-    input_audio_transcription={},
-    speech_config=SpeechConfig(
-        voice_config=VoiceConfig(
-            prebuilt_voice_config=PrebuiltVoiceConfig(voice_name=VOICE_NAME)
-        )
-    ),
-    session_resumption=types.SessionResumptionConfig(handle=None),
-    system_instruction=SYSTEM_INSTRUCTION,
-    tools=[],
-)
+# Function-calling tools; each persona declares the subset it uses (get_order_status, ...)
+tool_runtime = build_default_runtime()
+
+# LiveAPI Configuration: one cached config per persona, rebuilt when its instruction
+# file or live_settings.json changes. New sessions take the current snapshot;
+# running sessions keep the one they started with.
+config_store = LiveConfigStore(tool_runtime=tool_runtime)
+CONFIG_WATCH_INTERVAL_S = 2.0
+METRICS_LOG_INTERVAL_S = 60.0
+USAGE_EXPORT_INTERVAL_S = 300.0
+# Uplink audio buffered per connection: ~5 s of the client's 4096-sample frames
+AUDIO_BACKLOG_FRAMES = 20
+
+# Shared across clients so latency/error history accumulates process-wide
+summarizer_router = SummarizerRouter()
+
+# Token usage per session / model / hour (Live audio + summarizer calls)
+usage = UsageAccounting()
+
+# Pre-generated greeting clips (see greetings.py), played while Live connects
+greeting_cache = GreetingCache()
+
+# Authorized staff observers listening in on live conversations
+supervisors = SupervisorHub()
+
+# Returning-user profiles (rebuild the index with `python user_index.py`)
+user_memory = UserMemory()
 
 # ---------- Utilities ----------
 def ensure_dir(path: str):
@@ -113,266 +98,635 @@ def extract_json(text: str) -> dict:
             return {"raw": text.strip()}
     return {"raw": text.strip()}
 
-def pick_summarizer_model(live_or_text_model: str) -> str:
+def requested_persona(websocket) -> str:
+    """Persona from ?persona=<name>, else the path (ws://host:8765/hemmafy), else the default."""
+    params = connection_params(websocket)
+    path = urlsplit(connection_path(websocket)).path.strip("/")
+    return params.get("persona") or path or DEFAULT_PERSONA
+
+def requested_session_key(websocket) -> str:
+    """The key this server issued earlier, from ?session=<key> (a reconnecting client), else a new one."""
+    key = connection_params(websocket).get("session")
+    if key:
+        if verify_session_key(key):
+            return key
+        # Only keys this server signed restore a session; anything else starts afresh
+        logger.warning("Rejected a session key this server did not issue")
+        metrics.incr("session_key_rejected")
+    return issue_session_key()
+
+def requested_user_id(websocket):
     """
-    Map Live/native-audio models to a compatible text model for generateContent.
-    Falls back to the original if it's already a text model.
+    Verified user id from ?user_token=<signed token> (opts in to returning-user
+    memory), else None. A bare, unsigned id is never trusted: the profile holds
+    a minor's wellness history.
     """
-    m = (live_or_text_model or "").lower()
-
-    # Common live/native-audio identifiers
-    if "live" in m or "native-audio" in m or "realtime" in m:
-        # Prefer a modern Flash text model available in Vertex region
-        # Adjust these if you have specific allowlists in your project/region
-        if "2.5" in m or "2-5" in m:
-            return "gemini-2.0-flash-exp"      # good general fast text model
-        if "2.0" in m or "2-" in m:
-            return "gemini-2.0-flash-exp"
-        # Fallback
-        return "gemini-1.5-flash"
-
-    # If the provided model is already a text model, keep it
-    return live_or_text_model or "gemini-1.5-flash"
-
+    token = connection_params(websocket).get("user_token")
+    if not token:
+        return None
+    user_id = verify_user_token(token)
+    if user_id is None:
+        logger.warning("Rejected invalid or expired user token")
+        metrics.incr("user_token_rejected")
+    return user_id
+
+def flatten_transcript(transcript: list) -> str:
+    """Render structured turns as 'ROLE: text' lines."""
+    flat_lines = []
+    for turn in transcript:
+        role = turn.get("role", "user")
+        text = turn.get("text", "").strip()
+        if text:
+            flat_lines.append(f"{role.upper()}: {text}")
+    return "\n".join(flat_lines)
 
 class LiveAPIWebSocketServer(BaseWebSocketServer):
     """WebSocket server implementation using Gemini LiveAPI directly."""
 
-    # Keep transcript and session handle per client
+    # Keep transcript and session handle per session key (stable across reconnects);
+    # state_store persists them so another worker or a restart can pick them up
     def __init__(self):
         super().__init__()
-        self.session_transcripts = {}  # client_id -> list of {role, text, ts}
-        self.session_ids = {}          # client_id -> latest session handle
+        self.session_transcripts = {}  # session_key -> list of {role, text, ts}
+        self.session_ids = {}          # session_key -> latest session handle
+        self.live_configs = {}         # session_key -> LiveConfigSnapshot in use
+        self.user_ids = {}             # session_key -> returning-user id, if given
+        self.state_store = build_session_store()
+
+    async def start(self):
+        # Background jobs live as long as the server
+        # A reloaded instruction may come with regenerated greeting clips
+        watcher = asyncio.create_task(config_store.watch(CONFIG_WATCH_INTERVAL_S, on_reload=greeting_cache.invalidate))
+        reporter = asyncio.create_task(log_metrics_periodically(METRICS_LOG_INTERVAL_S))
+        exporter = asyncio.create_task(usage.export_periodically(USAGE_EXPORT_INTERVAL_S))
+        await self.state_store.start()
+        await user_memory.start()
+        try:
+            await super().start()
+        finally:
+            watcher.cancel()
+            reporter.cancel()
+            exporter.cancel()
+            tool_runtime.shutdown()
+            await self.state_store.close()
+            user_memory.close()
+
+    def record_turn(self, session_key: str, role: str, text: str):
+        """Append a transcript turn in memory and queue it for the state store."""
+        turn = {
+            "role": role,
+            "text": text,
+            "ts": datetime.now(timezone.utc).isoformat()
+        }
+        self.session_transcripts[session_key].append(turn)
+        self.state_store.append_turn(session_key, turn)
 
     async def process_audio(self, websocket, client_id):
-        # Store reference to client
-        self.active_clients[client_id] = websocket
-
-        # Init transcript buffer for this client
-        self.session_transcripts[client_id] = []
-
-        # Connect to Gemini using LiveAPI
-        async with client.aio.live.connect(model=MODEL, config=config) as session:
-            async with asyncio.TaskGroup() as tg:
-                # Create a queue for audio data from the client
-                audio_queue = asyncio.Queue()
+        # Time-to-first-audio is measured from here (right after "ready")
+        connected_at = time.monotonic()
+
+        # Staff observer: ws://host:8765/supervise?session=<session ref from the logs>&token=<SUPERVISOR_TOKEN>
+        if urlsplit(connection_path(websocket)).path.strip("/") == "supervise":
+            await self.serve_supervisor(websocket)
+            return
+
+        # Pin this session to the persona's config generation that is current right now
+        persona = requested_persona(websocket)
+        live = config_store.current(persona)
+        if live is None:
+            logger.warning(f"Unknown persona '{persona}'")
+            await websocket.send(json.dumps({
+                "type": "error",
+                "data": f"unknown persona '{persona}'; available: {', '.join(config_store.personas())}"
+            }))
+            return
+        update_log_context(persona=persona)
+        metrics.incr(f"connections.persona.{persona}")
+
+        # Key all session state by a stable id; restore it if the client is reconnecting.
+        # The key restores the conversation, so only its hash (ref) is logged or shown to staff
+        session_key = requested_session_key(websocket)
+        ref = session_ref(session_key)
+        update_log_context(session=ref)
+        restored = await self.state_store.load(session_key)
+        if restored:
+            logger.info(f"Restored session with {len(restored.transcript)} turns")
+            metrics.incr("sessions_restored")
+            if restored.handle:
+                self.session_ids[session_key] = restored.handle
+        self.session_transcripts[session_key] = restored.transcript if restored else []
+        self.live_configs[session_key] = live
+        self.state_store.set_meta(session_key, client_id=client_id, persona=persona)
+
+        # Returning users ("?user_token=<signed token>") start with what earlier
+        # sessions learned; profiles come from wellness summaries, so only
+        # personas that write those get one
+        user_id = requested_user_id(websocket)
+        profile = None
+        if user_id:
+            self.user_ids[session_key] = user_id
+            self.state_store.set_meta(session_key, user_id=user_id)
+            if live.summary and live.summary.kind == "wellness":
+                profile = await user_memory.get(user_id)
+            if profile:
+                logger.info(f"Loaded profile for returning user ({profile.sessions} earlier sessions)")
 
-                # Task to process incoming WebSocket messages
-                async def handle_websocket_messages():
-                    async for message in websocket:
+        # Store reference to client
+        self.active_clients[session_key] = websocket
+        await websocket.send(json.dumps({"type": "session_key", "data": session_key}))
+
+        # "?mode=text" selects text-only responses: no audio is decoded, encoded or sent
+        response_mode = connection_params(websocket).get("mode", "audio")
+        if response_mode not in RESPONSE_MODES:
+            logger.warning(f"Unknown mode '{response_mode}', using audio")
+            response_mode = "audio"
+        live_model, live_config = live.for_mode(response_mode)
+        if profile:
+            # Every session config below derives from this, so rollovers keep the profile
+            live_config = derive_config(live_config, extra_instruction=profile.instruction())
+        metrics.incr(f"connections.{response_mode}")
+
+        # New sessions hear a cached greeting immediately instead of waiting for
+        # live.connect + generation; "?lang=<code>" picks the clip language.
+        # Returning users are greeted by the model, which knows who they are
+        greeting = None
+        if not restored and not profile:
+            lang = greeting_lang(connection_params(websocket).get("lang"))
+            greeting = await greeting_cache.get(persona, live.voice_name, lang)
+        first_audio_sent = False
+
+        def note_first_audio(source: str):
+            nonlocal first_audio_sent
+            if not first_audio_sent:
+                first_audio_sent = True
+                metrics.observe(f"time_to_first_audio.{source}", (time.monotonic() - connected_at) * 1000)
+
+        # Queues for client input (outlive individual Live sessions). Audio is
+        # capped: while a session is being swapped only the latest few seconds
+        # are kept, rather than replaying everything into the new session at once
+        audio_queue = asyncio.Queue(maxsize=AUDIO_BACKLOG_FRAMES)
+        text_queue = asyncio.Queue()
+
+        # Estimated context size of the current Live session, and the recap for
+        # the next one, written in the background as the rollover approaches
+        context = ContextTracker(live.context_policy)
+        rollover_seed = None  # (task, transcript length when it started)
+
+        def prepare_rollover_seed():
+            nonlocal rollover_seed
+            if rollover_seed is None:
+                covered = len(self.session_transcripts.get(session_key, []))
+                rollover_seed = (asyncio.create_task(self.build_rollover_seed(session_key, live)), covered)
+
+        def rollover_seed_ready() -> bool:
+            return rollover_seed is not None and rollover_seed[0].done()
+
+        def take_rollover_seed() -> str:
+            """The prepared recap plus, verbatim, the turns that came after it was started."""
+            nonlocal rollover_seed
+            task, covered = rollover_seed
+            rollover_seed = None
+            seed = task.result()
+            later = flatten_transcript(self.session_transcripts.get(session_key, [])[covered:])
+            if later:
+                seed = f"{seed}\n\nMOST RECENT TURNS:\n{later}" if seed else later
+            return seed
+
+        # Idle parking: last uplink speech / typed text / model output, and the
+        # wake-up signal for a parked connection
+        last_activity = time.monotonic()
+        parked = False
+        wake = asyncio.Event()
+
+        def mark_active():
+            nonlocal last_activity
+            last_activity = time.monotonic()
+            if parked:
+                wake.set()
+
+        # Each outbound frame is serialized once; the same string goes to the user
+        # and, without awaiting, to any supervisors attached to this session
+        async def send_frame(frame: str, what: str):
+            try:
+                await websocket.send(frame)
+            except Exception as se:
+                logger.error(f"Error sending {what} over WS: {se}")
+            supervisors.publish(ref, frame)
+
+        # Task to process incoming WebSocket messages
+        async def handle_websocket_messages():
+            async for message in websocket:
+                try:
+                    data = json.loads(message)
+                    if data.get("type") == "audio":
+                        if response_mode == "text":
+                            continue  # text-only connection: never decode audio
+                        audio_bytes = base64.b64decode(data.get("data", ""))
+                        if is_speech(audio_bytes):
+                            mark_active()
+                        elif parked:
+                            continue  # no session to feed; drop silence instead of buffering it
+                        if audio_queue.full():
+                            audio_queue.get_nowait()
+                            audio_queue.task_done()
+                            metrics.incr("audio_frames_dropped")
+                        audio_queue.put_nowait(audio_bytes)
+                    elif data.get("type") == "end":
+                        logger.info("Received end signal from client")
+                        # Summarize on demand when client signals end
                         try:
-                            data = json.loads(message)
-                            if data.get("type") == "audio":
-                                audio_bytes = base64.b64decode(data.get("data", ""))
-                                await audio_queue.put(audio_bytes)
-                            elif data.get("type") == "end":
-                                logger.info("Received end signal from client")
-                                # Summarize on demand when client signals end
-                                try:
-                                    saved_path = await self.summarize_and_store(client_id)
-                                    try:
-                                        await websocket.send(json.dumps({
-                                            "type": "summary_saved",
-                                            "data": saved_path or "ok"
-                                        }))
-                                    except Exception as se:
-                                        # websocket might already be closing; just log
-                                        logger.error(f"Error sending summary_saved over WS: {se}")
-                                except Exception as e:
-                                    logger.error(f"Summarization error: {e}")
-                                    try:
-                                        await websocket.send(json.dumps({
-                                            "type": "summary_saved",
-                                            "data": f"error: {e}"
-                                        }))
-                                    except Exception as se:
-                                        logger.error(f"Error sending error over WS: {se}")
-                            elif data.get("type") == "text":
-                                txt = data.get("data")
-                                logger.info(f"Received text: {txt}")
-                                # Record explicit text messages from client as user turns
-                                if txt:
-                                    self.session_transcripts[client_id].append({
-                                        "role": "user",
-                                        "text": txt,
-                                        "ts": datetime.now(timezone.utc).isoformat()
-                                    })
-                        except json.JSONDecodeError:
-                            logger.error("Invalid JSON message received")
+                            saved_path = await self.summarize_and_store(session_key, client_id)
+                            try:
+                                await websocket.send(json.dumps({
+                                    "type": "summary_saved",
+                                    "data": saved_path or "ok"
+                                }))
+                            except Exception as se:
+                                # websocket might already be closing; just log
+                                logger.error(f"Error sending summary_saved over WS: {se}")
                         except Exception as e:
-                            logger.error(f"Error processing message: {e}")
-
-                # Task to process and send audio to Gemini
-                async def process_and_send_audio():
-                    while True:
-                        data = await audio_queue.get()
-                        await session.send_realtime_input(
-                            media={
-                                "data": data,
-                                "mime_type": f"audio/pcm;rate={SEND_SAMPLE_RATE}",
-                            }
-                        )
-                        audio_queue.task_done()
-
-                # Task to receive and play responses
-                async def receive_and_play():
-                    while True:
-                        input_transcriptions = []
-                        output_transcriptions = []
-
-                        async for response in session.receive():
-                            if response.session_resumption_update:
-                                update = response.session_resumption_update
-                                if update.resumable and update.new_handle:
-                                    session_id = update.new_handle
-                                    logger.info(f"New SESSION: {session_id}")
-                                    # Keep latest handle per client
-                                    self.session_ids[client_id] = session_id
-
-                                    session_id_msg = json.dumps({
-                                        "type": "session_id", "data": session_id
-                                    })
-                                    try:
-                                        await websocket.send(session_id_msg)
-                                    except Exception as se:
-                                        logger.error(f"Error sending session_id over WS: {se}")
-
-                            if response.go_away is not None:
-                                logger.info(f"Session will terminate in: {response.go_away.time_left}")
-
-                            server_content = response.server_content
-
-                            if (hasattr(server_content, "interrupted") and server_content.interrupted):
-                                logger.info("🤐 INTERRUPTION DETECTED")
-                                try:
-                                    await websocket.send(json.dumps({
-                                        "type": "interrupted",
-                                        "data": "Response interrupted by user input"
-                                    }))
-                                except Exception as se:
-                                    logger.error(f"Error sending interrupted over WS: {se}")
-
-                            if server_content and server_content.model_turn:
-                                for part in server_content.model_turn.parts:
-                                    if part.inline_data:
-                                        b64_audio = base64.b64encode(part.inline_data.data).decode('utf-8')
-                                        try:
-                                            await websocket.send(json.dumps({
-                                                "type": "audio", "data": b64_audio
-                                            }))
-                                        except Exception as se:
-                                            logger.error(f"Error sending audio over WS: {se}")
-
-                            if server_content and server_content.turn_complete:
-                                logger.info("✅ Gemini done talking")
-                                try:
-                                    await websocket.send(json.dumps({ "type": "turn_complete" }))
-                                except Exception as se:
-                                    logger.error(f"Error sending turn_complete over WS: {se}")
-
-                            output_transcription = getattr(response.server_content, "output_transcription", None)
-                            if output_transcription and output_transcription.text:
-                                text_out = output_transcription.text
-                                output_transcriptions.append(text_out)
-                                try:
-                                    await websocket.send(json.dumps({
-                                        "type": "text", "data": text_out
-                                    }))
-                                except Exception as se:
-                                    logger.error(f"Error sending text over WS: {se}")
+                            logger.error(f"Summarization error: {e}")
+                            try:
+                                await websocket.send(json.dumps({
+                                    "type": "summary_saved",
+                                    "data": f"error: {e}"
+                                }))
+                            except Exception as se:
+                                logger.error(f"Error sending error over WS: {se}")
+                    elif data.get("type") == "text":
+                        txt = data.get("data")
+                        logger.info(f"Received text ({len(txt or '')} chars)", extra={"sample": "turn"})
+                        # Record explicit text messages from client as user turns
+                        if txt:
+                            self.record_turn(session_key, "user", txt)
+                            mark_active()
+                            await text_queue.put(txt)
+                except json.JSONDecodeError:
+                    logger.error("Invalid JSON message received")
+                except Exception as e:
+                    logger.error(f"Error processing message: {e}")
+
+        # Task to process and send audio to Gemini
+        async def process_and_send_audio(session):
+            while True:
+                data = await audio_queue.get()
+                await session.send_realtime_input(
+                    media={
+                        "data": data,
+                        "mime_type": f"audio/pcm;rate={SEND_SAMPLE_RATE}",
+                    }
+                )
+                context.add_input_audio(len(data))
+                audio_queue.task_done()
+
+        # Task to forward typed user turns to Gemini
+        async def process_and_send_text(session):
+            while True:
+                txt = await text_queue.get()
+                await session.send_client_content(
+                    turns=types.Content(role="user", parts=[types.Part(text=txt)]),
+                    turn_complete=True,
+                )
+                context.add_text(txt)
+                metrics.incr("text_turns")
+                text_queue.task_done()
+
+        # Run the model's function calls off the receive loop and reply
+        async def answer_tool_call(session, tool_call):
+            try:
+                function_responses = await tool_runtime.handle_tool_call(tool_call)
+                await session.send_tool_response(function_responses=function_responses)
+            except Exception as e:
+                logger.error(f"Error answering tool call: {e}")
+
+        # Task to receive and play responses
+        async def receive_and_play(session, tg):
+            while True:
+                input_transcriptions = []
+                output_transcriptions = []
+
+                async for response in session.receive():
+                    context.observe_usage(response.usage_metadata)
+                    if response.server_content or response.tool_call:
+                        mark_active()
+                    usage.record(ref, live_model, response.usage_metadata)
+
+                    if response.session_resumption_update:
+                        update = response.session_resumption_update
+                        if update.resumable and update.new_handle:
+                            session_id = update.new_handle
+                            update_log_context(session_handle=session_id)
+                            logger.info("New SESSION handle", extra={"sample": "session_handle"})
+                            # Keep latest handle per session
+                            self.session_ids[session_key] = session_id
+                            self.state_store.set_handle(session_key, session_id)
+
+                            session_id_msg = json.dumps({
+                                "type": "session_id", "data": session_id
+                            })
+                            try:
+                                await websocket.send(session_id_msg)
+                            except Exception as se:
+                                logger.error(f"Error sending session_id over WS: {se}")
+
+                    if response.tool_call:
+                        tg.create_task(answer_tool_call(session, response.tool_call))
+
+                    if response.go_away is not None:
+                        logger.info(f"Session will terminate in: {response.go_away.time_left}")
+
+                    server_content = response.server_content
+
+                    if (hasattr(server_content, "interrupted") and server_content.interrupted):
+                        logger.info("🤐 INTERRUPTION DETECTED", extra={"sample": "turn"})
+                        await send_frame(json.dumps({
+                            "type": "interrupted",
+                            "data": "Response interrupted by user input"
+                        }), "interrupted")
+
+                    if server_content and server_content.model_turn:
+                        for part in server_content.model_turn.parts:
+                            if response_mode == "text" and part.text:
+                                context.add_text(part.text)
+                                output_transcriptions.append(part.text)
+                                await send_frame(json.dumps({
+                                    "type": "text", "data": part.text
+                                }), "text")
                                 # Record assistant outputs
-                                self.session_transcripts[client_id].append({
-                                    "role": "assistant",
-                                    "text": text_out,
-                                    "ts": datetime.now(timezone.utc).isoformat()
-                                })
-
-                            input_transcription = getattr(response.server_content, "input_transcription", None)
-                            if input_transcription and input_transcription.text:
-                                text_in = input_transcription.text
-                                input_transcriptions.append(text_in)
-                                # Record user recognized speech
-                                self.session_transcripts[client_id].append({
-                                    "role": "user",
-                                    "text": text_in,
-                                    "ts": datetime.now(timezone.utc).isoformat()
-                                })
-
-                        logger.info(f"Output transcription: {''.join(output_transcriptions)}")
-                        logger.info(f"Input transcription: {''.join(input_transcriptions)}")
-
-                # Start all tasks
-                tg.create_task(handle_websocket_messages())
-                tg.create_task(process_and_send_audio())
-                tg.create_task(receive_and_play())
+                                self.record_turn(session_key, "assistant", part.text)
+                            if part.inline_data:
+                                note_first_audio("live")
+                                context.add_output_audio(len(part.inline_data.data))
+                                b64_audio = base64.b64encode(part.inline_data.data).decode('utf-8')
+                                await send_frame(json.dumps({
+                                    "type": "audio", "data": b64_audio
+                                }), "audio")
+
+                    if server_content and server_content.turn_complete:
+                        logger.info("✅ Gemini done talking", extra={"sample": "turn"})
+                        await send_frame(json.dumps({ "type": "turn_complete" }), "turn_complete")
+                        # Turn boundary: safe point to move to a fresh session, once
+                        # the recap started in the background is ready
+                        if context.should_prepare_rollover():
+                            prepare_rollover_seed()
+                        if context.should_rollover() and rollover_seed_ready():
+                            raise SessionRollover()
+
+                    output_transcription = getattr(response.server_content, "output_transcription", None)
+                    if output_transcription and output_transcription.text:
+                        text_out = output_transcription.text
+                        output_transcriptions.append(text_out)
+                        await send_frame(json.dumps({
+                            "type": "text", "data": text_out
+                        }), "text")
+                        # Record assistant outputs
+                        self.record_turn(session_key, "assistant", text_out)
+
+                    input_transcription = getattr(response.server_content, "input_transcription", None)
+                    if input_transcription and input_transcription.text:
+                        text_in = input_transcription.text
+                        input_transcriptions.append(text_in)
+                        # Record user recognized speech
+                        self.record_turn(session_key, "user", text_in)
+                        # Observers also see what the user said (the user's own client does not)
+                        if supervisors.watching(ref):
+                            supervisors.publish(ref, json.dumps({
+                                "type": "user_text", "data": text_in
+                            }))
+
+                # Lengths only: full transcripts are kept in session_transcripts, not the log
+                logger.debug(
+                    f"Turn transcription chars: out={sum(map(len, output_transcriptions))} "
+                    f"in={sum(map(len, input_transcriptions))}",
+                    extra={"sample": "turn"},
+                )
+
+        # Task to play the cached greeting while the Live session is still connecting
+        async def play_greeting():
+            self.record_turn(session_key, "assistant", greeting.text)
+            if response_mode == "text":
+                await send_frame(json.dumps({"type": "text", "data": greeting.text}), "greeting")
+                return
+            for frame in greeting.frames:
+                await send_frame(frame, "greeting")
+                note_first_audio("greeting")
+            metrics.incr("greetings_played")
+
+        # Task to close the Live session once nothing has happened for IDLE_PARK_S
+        async def watch_idle():
+            while True:
+                idle_for = time.monotonic() - last_activity
+                if idle_for >= IDLE_PARK_S:
+                    raise SessionParked()
+                await asyncio.sleep(IDLE_PARK_S - idle_for)
+
+        # Task to run Live sessions back to back while the WebSocket stays open:
+        # a rollover swaps in a fresh, summary-seeded session; parking closes the
+        # session during silence and resumes it from the latest handle on activity.
+        # A handle that no longer resumes (expired) falls back to a recap
+        async def run_live_sessions():
+            nonlocal parked
+            session_config = live_config
+            if greeting:
+                session_config = derive_config(live_config, extra_instruction=greeting.instruction())
+            # A restored session resumes its Live handle, or continues from a recap
+            resume_handle = restored.handle if restored else None
+            if restored and not restored.handle and restored.transcript:
+                seed = await self.build_rollover_seed(session_key, live)
+                session_config = derive_config(live_config, extra_instruction=seed)
+            while True:
+                outcome = None
+                connected = False
+                try:
+                    # Connect to Gemini using LiveAPI
+                    connect_config = derive_config(session_config, handle=resume_handle)
+                    async with client.aio.live.connect(model=live_model, config=connect_config) as session:
+                        connected = True
+                        metrics.add_gauge("live_sessions_active", 1)
+                        try:
+                            async with asyncio.TaskGroup() as tg:
+                                if response_mode == "audio":
+                                    tg.create_task(process_and_send_audio(session))
+                                tg.create_task(process_and_send_text(session))
+                                tg.create_task(receive_and_play(session, tg))
+                                if IDLE_PARK_S > 0:
+                                    tg.create_task(watch_idle())
+                        finally:
+                            metrics.add_gauge("live_sessions_active", -1)
+                except* SessionRollover:
+                    outcome = "rollover"
+                except* SessionParked:
+                    outcome = "parked"
+                except* Exception:
+                    # Only a failed resume is recoverable here: handles expire
+                    if connected or not resume_handle:
+                        raise
+                    outcome = "resume_failed"
+
+                if outcome == "resume_failed":
+                    logger.warning("Could not resume the Live session from its handle (likely expired); "
+                                   "continuing from a recap")
+                    metrics.incr("session_resume_fallbacks")
+                    self.session_ids.pop(session_key, None)
+                    self.state_store.set_handle(session_key, None)
+                    resume_handle = None
+                    seed = await self.build_rollover_seed(session_key, live)
+                    session_config = derive_config(live_config, extra_instruction=seed)
+                    continue
+
+                if outcome == "parked":
+                    logger.info(f"No activity for {IDLE_PARK_S:.0f}s; parking Live session")
+                    metrics.incr("sessions_parked_total")
+                    metrics.add_gauge("live_sessions_parked", 1)
+                    parked = True
+                    wake.clear()
+                    try:
+                        await wake.wait()
+                    finally:
+                        parked = False
+                        metrics.add_gauge("live_sessions_parked", -1)
+                    logger.info("Activity detected; resuming Live session")
+                    metrics.incr("sessions_resumed_total")
+                    resume_handle = self.session_ids.get(session_key)
+                    if resume_handle is None:
+                        # Never got a resumable handle: carry the conversation over as a recap
+                        seed = await self.build_rollover_seed(session_key, live)
+                        session_config = derive_config(live_config, extra_instruction=seed)
+                    continue
+
+                logger.info(f"Session processed ~{context.total_tokens} tokens; rolling over to a new session")
+                metrics.incr("context_rollovers")
+                # The old handle would bring back the full pre-rollover context on a
+                # later resume or reconnect; the new session reports its own
+                self.session_ids.pop(session_key, None)
+                self.state_store.set_handle(session_key, None)
+                seed = take_rollover_seed()
+                session_config = derive_config(live_config, extra_instruction=seed)
+                resume_handle = None
+                context.reset()
+                context.add_text(seed)
+
+        # Start all tasks; the Live side stops once the client goes away
+        try:
+            async with asyncio.TaskGroup() as tg:
+                if greeting:
+                    tg.create_task(play_greeting())
+                live_task = tg.create_task(run_live_sessions())
+                await handle_websocket_messages()
+                live_task.cancel()
+        finally:
+            if rollover_seed is not None:
+                rollover_seed[0].cancel()
+            # A reconnect with the same key (before this socket was noticed closing)
+            # has already taken over the key's state; only its owner cleans it up
+            if self.active_clients.get(session_key) is websocket:
+                logger.info(f"Token usage for session {ref}: {usage.session_totals(ref)['total']}")
+                usage.forget_session(ref)
+                # Durable copy lives in the state store; drop the in-process one
+                self.active_clients.pop(session_key, None)
+                self.session_transcripts.pop(session_key, None)
+                self.session_ids.pop(session_key, None)
+                self.live_configs.pop(session_key, None)
+                self.user_ids.pop(session_key, None)
+                supervisors.end(ref)
+            else:
+                logger.info("Connection closed after its session key was taken over by a reconnect")
+
+    async def serve_supervisor(self, websocket):
+        """Attach an authorized observer connection to a live session's stream."""
+        params = connection_params(websocket)
+        if not supervisor_authorized(params.get("token")):
+            logger.warning("Rejected supervisor connection")
+            metrics.incr("supervisor_rejected")
+            await websocket.send(json.dumps({"type": "error", "data": "unauthorized"}))
+            return
+        target = params.get("session")
+        if not any(session_ref(key) == target for key in self.active_clients):
+            metrics.incr("supervisor_rejected")
+            await websocket.send(json.dumps({"type": "error", "data": "no such active session"}))
+            return
+        update_log_context(supervising=target)
+        await supervisors.serve(websocket, target)
+
+    # ---------- Context rollover ----------
+    async def build_rollover_seed(self, session_key: str, live) -> str:
+        """
+        Condense the conversation so far into a short recap that seeds the next
+        Live session's system instruction. Falls back to the latest turns if
+        the summarizer is unavailable.
+        """
+        transcript = self.session_transcripts.get(session_key, [])
+        flat_transcript = flatten_transcript(transcript)
+        if not flat_transcript:
+            return ""
+
+        max_words = live.context_policy.rollover_summary_words
+        prompt = (
+            f"Summarize this ongoing conversation in at most {max_words} words for the assistant "
+            "who will continue it: who the user is, how they feel, what was discussed, "
+            "what was suggested and any safety concerns. Plain text only.\n\n"
+            f"TRANSCRIPT:\n{flat_transcript}"
+        )
+
+        async def call_model(model: str):
+            return await client.aio.models.generate_content(
+                model=model,
+                contents=prompt,
+                config=types.GenerateContentConfig(temperature=0.2),
+            )
+
+        try:
+            model, gen = await summarizer_router.generate(summarizer_candidates(live.model), call_model)
+            usage.record(session_ref(session_key), model, gen.usage_metadata)
+            recap = (gen.text or "").strip()
+        except Exception as e:
+            logger.error(f"Rollover summary failed, seeding with recent turns: {e}")
+            recap = flatten_transcript(transcript[-12:])
+
+        return (
+            "CONVERSATION SO FAR (this is a continuation; do not greet the user again or "
+            f"re-ask things already covered):\n{recap}"
+        )
 
     # ---------- Summarize & store function ----------
-    async def summarize_and_store(self, client_id: str):
+    async def summarize_and_store(self, session_key: str, client_id=None):
         """
         Summarizes the full transcript for a client using a compatible Gemini text model
-        and writes a JSON file with youth wellness oriented fields (non-clinical).
-        Returns the saved file path (string) or None.
+        and writes a JSON file with the fields of the persona's SummarySpec (youth
+        wellness fields, non-clinical, for YouthGuide). Returns the saved file path
+        (string) or None.
         """
-        transcript = self.session_transcripts.get(client_id, [])
+        transcript = self.session_transcripts.get(session_key, [])
         if not transcript:
             logger.info("No transcript found; skipping summary.")
             return None
 
+        live = self.live_configs.get(session_key) or config_store.current()
+        spec = live.summary
+        if spec is None:
+            logger.info(f"Summaries are disabled for persona '{live.persona}'; skipping summary.")
+            return None
+
         # Prepare a compact transcript string (role: text)
-        flat_lines = []
-        for turn in transcript:
-            role = turn.get("role", "user")
-            text = turn.get("text", "").strip()
-            if text:
-                flat_lines.append(f"{role.upper()}: {text}")
-        flat_transcript = "\n".join(flat_lines)
-
-        session_handle = self.session_ids.get(client_id)
-
-        # Instruction to produce STRICT JSON (no clinical diagnoses)
-        system_note = (
-            "You are YouthGuide, a supportive, empathetic AI mentor for young people. "
-            "Summarize the user's full conversation in a youth wellness context. "
-            "You must NOT provide any medical diagnosis. "
-            "Detect safety concerns and reflect them as flags only. "
-            "Return STRICT JSON only—no markdown, no code fences, no extra text."
-        )
+        flat_transcript = flatten_transcript(transcript)
 
-        # JSON schema we want (kept simple and extensible)
-        schema_hint = {
-            "session_id": session_handle or "",
-            "generated_at_utc": datetime.now(timezone.utc).isoformat(),
-            "language": "auto",
-            "summary": "",
-            "main_points": [],
-            "emotions_themes": [],
-            "stressors": [],
-            "protective_factors": [],
-            "coping_strategies_discussed": [],
-            "goals_or_hopes": [],
-            "action_items_suggested": [],
-            "risk_flags": {
-                "mentions_self_harm": False,
-                "mentions_harming_others": False,
-                "mentions_abuse_or_unsafe": False,
-                "urgent_support_recommended": False
-            },
-            "suggestions_non_clinical": [],
-        }
+        session_handle = self.session_ids.get(session_key)
+
+        # Instruction to produce STRICT JSON, and the schema we want (per persona)
+        system_note = spec.system_note
+        schema_hint = spec.schema_hint(session_handle)
 
         user_prompt = (
             "Summarize the following conversation verbatim transcript between USER and ASSISTANT. "
-            "Focus on the youth's wellness state and the core points discussed. "
+            f"{spec.focus} "
             "Infer language if not explicit. "
             "Fill the provided JSON schema faithfully and only return the JSON object.\n\n"
             f"JSON_SCHEMA_EXAMPLE:\n{json.dumps(schema_hint, ensure_ascii=False, indent=2)}\n\n"
             f"TRANSCRIPT:\n{flat_transcript}"
         )
 
-        # Pick a compatible model for generateContent (avoids INVALID_ARGUMENT)
-        summarizer_model = pick_summarizer_model(MODEL)
-        if summarizer_model != MODEL:
-            logger.info(f"Using summarizer model '{summarizer_model}' for generateContent (from '{MODEL}')")
+        # Candidate text models for generateContent (avoids INVALID_ARGUMENT on Live models)
+        candidates = summarizer_candidates(live.model)
 
         # Build Content/Part properly
         user_content = types.Content(
@@ -380,16 +734,21 @@ class LiveAPIWebSocketServer(BaseWebSocketServer):
             parts=[types.Part(text=user_prompt)]
         )
 
-        # Call the text model
-        gen = await client.aio.models.generate_content(
-            model=summarizer_model,
-            contents=[user_content],  # could also pass contents=user_prompt (string)
-            config=types.GenerateContentConfig(
-                temperature=0.2,
-                system_instruction=system_note,
-                response_mime_type="application/json"
+        async def call_model(model: str):
+            return await client.aio.models.generate_content(
+                model=model,
+                contents=[user_content],  # could also pass contents=user_prompt (string)
+                config=types.GenerateContentConfig(
+                    temperature=0.2,
+                    system_instruction=system_note,
+                    response_mime_type="application/json"
+                )
             )
-        )
+
+        # Call the text model (hedged across candidates)
+        summarizer_model, gen = await summarizer_router.generate(candidates, call_model)
+        logger.info(f"Summary generated by '{summarizer_model}' (live model '{live.model}')")
+        usage.record(session_ref(session_key), summarizer_model, getattr(gen, "usage_metadata", None))
 
         # Extract text safely
         text = ""
@@ -406,22 +765,39 @@ class LiveAPIWebSocketServer(BaseWebSocketServer):
         out_dir = os.path.join(os.path.dirname(__file__), "data", "summaries")
         ensure_dir(out_dir)
         ts = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
-        filename = f"{client_id}_{ts}.json"
+        filename = f"{session_ref(session_key)}_{ts}.json"
         out_path = os.path.join(out_dir, filename)
 
         # Add raw transcript for traceability
         payload = {
             "meta": {
                 "client_id": client_id,
+                "user_id": self.user_ids.get(session_key),
+                "session_ref": session_ref(session_key),
                 "session_id": session_handle,
+                "persona": live.persona,
+                "summary_kind": spec.kind,
+                "live_config_version": live.version,
+                "summarizer_model": summarizer_model,
+                "usage": usage.session_totals(session_ref(session_key)),
                 "saved_at_utc": datetime.now(timezone.utc).isoformat(),
             },
             "summary": summary_obj,
             "transcript": transcript  # full structured turns
         }
 
-        with open(out_path, "w", encoding="utf-8") as f:
+        # Write-then-rename so readers (analytics, the user index) never see a partial file
+        tmp_path = out_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, out_path)
+
+        user_id = self.user_ids.get(session_key)
+        if user_id:
+            try:
+                await user_memory.record_summary(user_id, payload)
+            except Exception as e:
+                logger.error(f"Updating user profile index failed: {e}")
 
         logger.info(f"✅ Summary saved to: {out_path}")
         return out_path
@@ -439,6 +815,4 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logger.info("Exiting application via KeyboardInterrupt...")
     except Exception as e:
-        logger.error(f"Unhandled exception in main: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Unhandled exception in main: {e}")
@@ -0,0 +1,44 @@
+"""
+Server-issued session keys. A key restores a whole conversation (transcript
+and Live handle), so the server accepts only keys it signed itself:
+
+    <32 hex nonce>-<first 32 hex of HMAC-SHA256(secret, nonce)>
+
+Logs, file names, usage exports and supervisors use session_ref(key), a
+one-way hash that identifies the session but cannot be used to reconnect.
+
+Standalone on purpose: it does not import common.py, so it needs no credentials.
+"""
+import hashlib
+import hmac
+import os
+import re
+import secrets
+from typing import Optional
+
+# Shared by all workers that share a session store. Unset: a random secret per
+# process, so keys only survive reconnects to the worker that issued them.
+SESSION_KEY_SECRET = os.environ.get("SESSION_KEY_SECRET") or secrets.token_hex(32)
+SESSION_KEY_RE = re.compile(r"^([0-9a-f]{32})-([0-9a-f]{32})$")
+
+
+def _signature(nonce: str, secret: str) -> str:
+    return hmac.new(secret.encode("utf-8"), nonce.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def issue_session_key(secret: Optional[str] = None) -> str:
+    nonce = secrets.token_hex(16)
+    return f"{nonce}-{_signature(nonce, secret or SESSION_KEY_SECRET)}"
+
+
+def verify_session_key(key, secret: Optional[str] = None) -> bool:
+    match = SESSION_KEY_RE.match(key) if isinstance(key, str) else None
+    if not match:
+        return False
+    nonce, signature = match.groups()
+    return hmac.compare_digest(signature, _signature(nonce, secret or SESSION_KEY_SECRET))
+
+
+def session_ref(key: str) -> str:
+    """Non-secret handle for a session key: safe to log and to put in file names."""
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,292 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from common import logger
+from metrics import metrics
+
+# "memory" (per process) or "sqlite" (survives restarts, shared by workers on one host)
+SESSION_STORE = os.environ.get("SESSION_STORE", "memory")
+SESSION_STORE_PATH = os.environ.get(
+    "SESSION_STORE_PATH", os.path.join(os.path.dirname(__file__), "data", "sessions.sqlite3")
+)
+FLUSH_INTERVAL_S = 0.5
+FLUSH_BATCH = 500
+# Sessions idle this long are forgotten by either store; the in-memory one also
+# keeps at most this many (least recently used go first)
+SESSION_TTL_S = float(os.environ.get("SESSION_TTL_S", str(6 * 3600)))
+MEMORY_STORE_MAX_SESSIONS = 10000
+# How often the SQLite flusher deletes sessions older than SESSION_TTL_S
+PURGE_INTERVAL_S = 60.0
+
+
+@dataclass
+class SessionRecord:
+    """Durable per-session state, keyed by the stable session key."""
+    session_key: str
+    transcript: list = field(default_factory=list)  # {role, text, ts}
+    handle: Optional[str] = None                     # latest Live resumption handle
+    meta: dict = field(default_factory=dict)         # client_id, persona, ...
+
+
+class SessionStateBackend:
+    """
+    Interface for session state. Writers call the non-blocking append_turn / set_*
+    methods from the event loop; implementations may buffer and persist later,
+    so the audio path never waits on storage. Only load() is awaited, once per
+    connection.
+    """
+
+    async def start(self):
+        pass
+
+    async def load(self, session_key: str) -> Optional[SessionRecord]:
+        raise NotImplementedError
+
+    def append_turn(self, session_key: str, turn: dict):
+        raise NotImplementedError
+
+    def set_handle(self, session_key: str, handle: Optional[str]):
+        raise NotImplementedError
+
+    def set_meta(self, session_key: str, **fields):
+        raise NotImplementedError
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        await self.flush()
+
+
+class InMemorySessionStore(SessionStateBackend):
+    """
+    Process-local state; survives reconnects to the same worker only. Bounded
+    by SESSION_TTL_S since last use and MEMORY_STORE_MAX_SESSIONS (LRU).
+    """
+
+    def __init__(self, ttl_s: float = SESSION_TTL_S, max_sessions: int = MEMORY_STORE_MAX_SESSIONS):
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self._records = OrderedDict()  # session_key -> SessionRecord, least recently used first
+        self._touched = {}             # session_key -> monotonic time of last use
+
+    def _evict(self, now: float):
+        while self._records:
+            oldest = next(iter(self._records))
+            if len(self._records) <= self.max_sessions and now - self._touched[oldest] < self.ttl_s:
+                break
+            del self._records[oldest]
+            del self._touched[oldest]
+            metrics.incr("session_store_evictions")
+
+    def _touch(self, session_key):
+        now = time.monotonic()
+        self._touched[session_key] = now
+        self._records.move_to_end(session_key)
+        self._evict(now)
+
+    def _record(self, session_key):
+        if session_key not in self._records:
+            self._records[session_key] = SessionRecord(session_key)
+        self._touch(session_key)
+        return self._records[session_key]
+
+    async def load(self, session_key):
+        self._evict(time.monotonic())
+        record = self._records.get(session_key)
+        if record is None:
+            return None
+        self._touch(session_key)
+        return SessionRecord(session_key, list(record.transcript), record.handle, dict(record.meta))
+
+    def append_turn(self, session_key, turn):
+        self._record(session_key).transcript.append(dict(turn))
+
+    def set_handle(self, session_key, handle):
+        self._record(session_key).handle = handle
+
+    def set_meta(self, session_key, **fields):
+        self._record(session_key).meta.update(fields)
+
+
+class SqliteSessionStore(SessionStateBackend):
+    """
+    SQLite-backed state. Writes are queued in memory and applied in one
+    transaction per batch by a background task running in a worker thread,
+    which also deletes sessions (and their turns) idle longer than ttl_s.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_key TEXT PRIMARY KEY,
+            handle      TEXT,
+            meta        TEXT NOT NULL DEFAULT '{}',
+            updated_at  REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS turns (
+            session_key TEXT NOT NULL,
+            seq         INTEGER PRIMARY KEY AUTOINCREMENT,
+            role        TEXT NOT NULL,
+            text        TEXT NOT NULL,
+            ts          TEXT
+        );
+        CREATE INDEX IF NOT EXISTS turns_by_session ON turns (session_key, seq);
+        CREATE INDEX IF NOT EXISTS sessions_by_age ON sessions (updated_at);
+    """
+
+    def __init__(self, path: str = SESSION_STORE_PATH, ttl_s: float = SESSION_TTL_S):
+        self.path = path
+        self.ttl_s = ttl_s
+        self._pending = []          # ("turn"|"handle"|"meta", session_key, payload)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._flusher = None
+        self._flush_lock = asyncio.Lock()  # keeps batches in order
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(self.SCHEMA)
+        return conn
+
+    async def start(self):
+        self._conn = await asyncio.to_thread(self._connect)
+        self._flusher = asyncio.create_task(self._flush_periodically())
+
+    # ---------- Reads ----------
+    def _load(self, session_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT handle, meta FROM sessions WHERE session_key = ?", (session_key,)
+            ).fetchone()
+            if row is None:
+                return None
+            turns = self._conn.execute(
+                "SELECT role, text, ts FROM turns WHERE session_key = ? ORDER BY seq", (session_key,)
+            ).fetchall()
+        return SessionRecord(
+            session_key,
+            [{"role": r, "text": t, "ts": ts} for r, t, ts in turns],
+            row[0],
+            json.loads(row[1] or "{}"),
+        )
+
+    async def load(self, session_key):
+        await self.flush()  # make our own queued writes visible first
+        return await asyncio.to_thread(self._load, session_key)
+
+    # ---------- Buffered writes ----------
+    def append_turn(self, session_key, turn):
+        self._pending.append(("turn", session_key, turn))
+
+    def set_handle(self, session_key, handle):
+        self._pending.append(("handle", session_key, handle))
+
+    def set_meta(self, session_key, **fields):
+        self._pending.append(("meta", session_key, fields))
+
+    def _apply(self, ops):
+        now = time.time()
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                for kind, key, payload in ops:
+                    cur.execute(
+                        "INSERT OR IGNORE INTO sessions (session_key, updated_at) VALUES (?, ?)", (key, now)
+                    )
+                    if kind == "turn":
+                        cur.execute(
+                            "INSERT INTO turns (session_key, role, text, ts) VALUES (?, ?, ?, ?)",
+                            (key, payload.get("role", "user"), payload.get("text", ""), payload.get("ts")),
+                        )
+                    elif kind == "handle":
+                        cur.execute("UPDATE sessions SET handle = ? WHERE session_key = ?", (payload, key))
+                    elif kind == "meta":
+                        meta = json.loads(cur.execute(
+                            "SELECT meta FROM sessions WHERE session_key = ?", (key,)
+                        ).fetchone()[0] or "{}")
+                        meta.update(payload)
+                        cur.execute("UPDATE sessions SET meta = ? WHERE session_key = ?",
+                                    (json.dumps(meta, default=str), key))
+                    cur.execute("UPDATE sessions SET updated_at = ? WHERE session_key = ?", (now, key))
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    # ---------- Retention ----------
+    def _purge(self, cutoff: float) -> int:
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                cur.execute(
+                    "DELETE FROM turns WHERE session_key IN "
+                    "(SELECT session_key FROM sessions WHERE updated_at < ?)", (cutoff,)
+                )
+                purged = cur.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+        return purged
+
+    async def purge_expired(self):
+        try:
+            purged = await asyncio.to_thread(self._purge, time.time() - self.ttl_s)
+        except Exception as e:
+            metrics.incr("session_store_purge_errors")
+            logger.error(f"Session store purge failed: {e}")
+            return
+        if purged:
+            metrics.incr("session_store_evictions", purged)
+            logger.info(f"Session store purged {purged} sessions idle over {self.ttl_s:g}s")
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._pending:
+                ops, self._pending = self._pending[:FLUSH_BATCH], self._pending[FLUSH_BATCH:]
+                started = time.monotonic()
+                try:
+                    await asyncio.to_thread(self._apply, ops)
+                except Exception as e:
+                    # Put the batch back so the next flush retries it
+                    self._pending[:0] = ops
+                    metrics.incr("session_store_flush_errors")
+                    logger.error(f"Session store flush failed ({len(ops)} ops): {e}")
+                    return
+                metrics.observe("session_store_flush", (time.monotonic() - started) * 1000)
+
+    async def _flush_periodically(self):
+        purged_at = time.monotonic()
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL_S)
+            await self.flush()
+            if time.monotonic() - purged_at >= PURGE_INTERVAL_S:
+                purged_at = time.monotonic()
+                await self.purge_expired()
+
+    async def close(self):
+        if self._flusher:
+            self._flusher.cancel()
+        await self.flush()
+        if self._conn:
+            self._conn.close()
+
+
+def build_session_store(kind: str = SESSION_STORE) -> SessionStateBackend:
+    if kind == "sqlite":
+        return SqliteSessionStore()
+    if kind == "memory":
+        return InMemorySessionStore()
+    raise ValueError(f"Unknown SESSION_STORE '{kind}' (expected 'memory' or 'sqlite')")
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from metrics import metrics, percentile
+
+logger = logging.getLogger("common")
+
+# Text models usable with generateContent, best first. The Live model is mapped
+# onto this table; the router reorders it at runtime by observed health.
+SUMMARIZER_CANDIDATES = [
+    "gemini-2.0-flash-exp",
+    "gemini-1.5-flash",
+]
+
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_S = 1.5
+HEDGE_MAX_S = 12.0
+HEDGE_DEFAULT_S = 6.0     # used until a model has enough samples
+MIN_SAMPLES = 5
+RANK_SAMPLES = 10         # ranking looks at recent samples only, so a slowdown shows quickly
+
+
+def summarizer_candidates(live_or_text_model: str) -> list:
+    """
+    Candidate text models for a Live/native-audio model. A model that is
+    already a text model is tried first, followed by the shared table.
+    """
+    m = (live_or_text_model or "").lower()
+    if not m or "live" in m or "native-audio" in m or "realtime" in m:
+        return list(SUMMARIZER_CANDIDATES)
+    return [live_or_text_model] + [c for c in SUMMARIZER_CANDIDATES if c != live_or_text_model]
+
+
+class ModelStats:
+    """Moving-window latency and error rate for one model."""
+
+    def __init__(self, window: int = 50):
+        self.latencies = deque(maxlen=window)   # seconds; successful or hedged-away calls
+        self.outcomes = deque(maxlen=window)    # True = error
+
+    def record_success(self, latency_s: float):
+        self.latencies.append(latency_s)
+        self.outcomes.append(False)
+
+    def record_error(self):
+        self.outcomes.append(True)
+
+    def record_cancelled(self, elapsed_s: float):
+        """A call that lost a hedge took at least `elapsed_s`; count that as its latency."""
+        self.latencies.append(elapsed_s)
+
+    @property
+    def error_rate(self) -> float:
+        return (sum(self.outcomes) / len(self.outcomes)) if self.outcomes else 0.0
+
+    def latency_percentile(self, q: float, recent: int = 0):
+        if len(self.latencies) < MIN_SAMPLES:
+            return None
+        samples = list(self.latencies)[-recent:] if recent else self.latencies
+        return percentile(samples, q)
+
+
+class SummarizerRouter:
+    """
+    Routes summarizer calls across candidate text models. The healthiest model
+    goes first; if it has not answered by its percentile deadline, a hedged
+    request goes to the next candidate and whichever finishes first wins.
+    """
+
+    def __init__(self, window: int = 50):
+        self._window = window
+        self.stats = {}
+
+    def _stats(self, model: str) -> ModelStats:
+        if model not in self.stats:
+            self.stats[model] = ModelStats(self._window)
+        return self.stats[model]
+
+    def ranked(self, candidates: list) -> list:
+        """Order candidates by error rate, then recent median latency; ties keep table order."""
+        def score(item):
+            idx, model = item
+            st = self._stats(model)
+            p50 = st.latency_percentile(50, recent=RANK_SAMPLES)
+            return (round(st.error_rate, 1), p50 if p50 is not None else HEDGE_DEFAULT_S, idx)
+        return [m for _, m in sorted(enumerate(candidates), key=score)]
+
+    def hedge_deadline(self, model: str) -> float:
+        p = self._stats(model).latency_percentile(HEDGE_PERCENTILE)
+        if p is None:
+            return HEDGE_DEFAULT_S
+        return min(HEDGE_MAX_S, max(HEDGE_MIN_S, p))
+
+    async def _timed(self, model: str, call):
+        started = time.monotonic()
+        try:
+            result = await call(model)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._stats(model).record_error()
+            metrics.incr(f"summarizer_errors.{model}")
+            raise
+        elapsed = time.monotonic() - started
+        self._stats(model).record_success(elapsed)
+        metrics.observe(f"summarizer_latency.{model}", elapsed * 1000)
+        return result
+
+    async def generate(self, candidates: list, call):
+        """
+        Run `await call(model)` against the best candidate, hedging to the next
+        one after the deadline. Returns (model, result) from the first success.
+        Raises the last error if every attempt fails.
+        """
+        order = self.ranked(candidates)
+        if not order:
+            raise ValueError("No summarizer candidates")
+
+        pending = {}  # task -> model
+        started = {}  # task -> launch time
+        last_error = None
+
+        def launch(model):
+            task = asyncio.create_task(self._timed(model, call))
+            pending[task] = model
+            started[task] = time.monotonic()
+
+        launch(order[0])
+        next_idx = 1
+        try:
+            while pending:
+                hedge_possible = next_idx < len(order)
+                timeout = self.hedge_deadline(order[0]) if (hedge_possible and next_idx == 1) else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Primary is slower than usual: hedge to the next candidate
+                    logger.info(f"Summarizer '{order[0]}' exceeded {timeout:.1f}s; hedging to '{order[next_idx]}'")
+                    metrics.incr("summarizer_hedges")
+                    launch(order[next_idx])
+                    next_idx += 1
+                    continue
+
+                for task in done:
+                    model = pending.pop(task)
+                    if task.exception() is None:
+                        if model != order[0]:
+                            metrics.incr("summarizer_hedge_wins")
+                        return model, task.result()
+                    last_error = task.exception()
+                    logger.warning(f"Summarizer '{model}' failed: {last_error}")
+
+                # Failed without a hedge in flight: fail over immediately
+                if not pending and next_idx < len(order):
+                    launch(order[next_idx])
+                    next_idx += 1
+        finally:
+            # Cancel the loser(s). A primary that lost its hedge took at least
+            # this long; recording that lets a slowed-down model drop in the ranking
+            # (a hedge that lost was started late, so its elapsed time says nothing)
+            now = time.monotonic()
+            for task, model in pending.items():
+                task.cancel()
+                if model == order[0]:
+                    self._stats(model).record_cancelled(now - started[task])
+        raise last_error
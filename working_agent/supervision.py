@@ -0,0 +1,95 @@
+import asyncio
+import hmac
+import json
+import os
+
+from common import logger
+from metrics import metrics
+
+# Shared secret for observer connections; unset disables supervision entirely
+SUPERVISOR_TOKEN = os.environ.get("SUPERVISOR_TOKEN")
+# Frames buffered per observer before the oldest are dropped (~a few seconds of audio)
+SUBSCRIBER_QUEUE_FRAMES = 256
+
+
+def supervisor_authorized(token) -> bool:
+    if not SUPERVISOR_TOKEN or not token:
+        return False
+    return hmac.compare_digest(str(token), SUPERVISOR_TOKEN)
+
+
+class SupervisorHub:
+    """
+    Fans out a session's already-serialized frames to observer connections,
+    keyed by the session ref (the hash of its key that the logs show).
+    publish() never awaits: each observer has its own bounded queue drained by
+    its own connection task, so a slow observer only loses its own oldest
+    frames and never delays the user's stream. end() detaches every observer of a session when it finishes.
+    """
+
+    def __init__(self, queue_frames: int = SUBSCRIBER_QUEUE_FRAMES):
+        self.queue_frames = queue_frames
+        self._subscribers = {}  # session ref -> set of asyncio.Queue
+
+    def watching(self, ref) -> bool:
+        return bool(self._subscribers.get(ref))
+
+    @staticmethod
+    def _put(q: asyncio.Queue, item):
+        if q.full():
+            q.get_nowait()
+            metrics.incr("supervisor_frames_dropped")
+        q.put_nowait(item)
+
+    def publish(self, ref, frame: str):
+        queues = self._subscribers.get(ref)
+        if not queues:
+            return
+        for q in queues:
+            self._put(q, frame)
+
+    def end(self, ref):
+        """The watched session is over: tell its observers and let them go."""
+        for q in self._subscribers.pop(ref, ()):
+            self._put(q, None)
+
+    async def serve(self, websocket, ref):
+        """Stream `ref`'s frames to one observer until either side goes away."""
+        q = asyncio.Queue(maxsize=self.queue_frames)
+        self._subscribers.setdefault(ref, set()).add(q)
+        metrics.add_gauge("supervisors_active", 1)
+        logger.info(f"Supervisor attached to session {ref}")
+
+        async def pump():
+            while True:
+                frame = await q.get()
+                if frame is None:
+                    await websocket.send(json.dumps({"type": "session_ended", "data": ref}))
+                    await websocket.close()
+                    return
+                await websocket.send(frame)
+
+        async def drain():
+            # Observers are listen-only; reading just notices when they leave
+            async for _ in websocket:
+                pass
+
+        tasks = set()
+        try:
+            await websocket.send(json.dumps({"type": "supervising", "data": ref}))
+            tasks = {asyncio.create_task(pump()), asyncio.create_task(drain())}
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    logger.info(f"Supervisor connection ended: {task.exception()}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            subscribers = self._subscribers.get(ref)
+            if subscribers is not None:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[ref]
+            metrics.add_gauge("supervisors_active", -1)
+            logger.info(f"Supervisor detached from session {ref}")
@@ -0,0 +1,114 @@
+import asyncio
+import importlib
+import os
+import sys
+import types as pytypes
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeLiveSession:
+    """
+    Plays back one scripted list of responses per receive() call, then idles.
+    A number in the list is a pause, in seconds, before the next response.
+    """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.sent = []
+
+    async def send_realtime_input(self, **kw):
+        self.sent.append(("realtime", kw))
+
+    async def send_client_content(self, **kw):
+        self.sent.append(("content", kw))
+
+    async def send_tool_response(self, **kw):
+        self.sent.append(("tool", kw))
+
+    async def receive(self):
+        if not self.script:
+            await asyncio.sleep(3600)
+        for response in self.script.pop(0):
+            if isinstance(response, (int, float)):
+                await asyncio.sleep(response)
+                continue
+            await asyncio.sleep(0)
+            yield response
+
+
+class FakeClient:
+    """Stands in for genai.Client: records live.connect configs, answers generate_content."""
+
+    def __init__(self, *args, **kwargs):
+        self.connects = []   # (model, config) per live.connect
+        self.sessions = []   # scripts for successive Live sessions
+        self.summary_text = "Recap of the conversation so far."
+        self.summary_delay_s = 0.0
+        client = self
+
+        class Live:
+            def connect(self, model, config):
+                class Connection:
+                    async def __aenter__(self):
+                        client.connects.append((model, config))
+                        return FakeLiveSession(client.sessions.pop(0) if client.sessions else [])
+
+                    async def __aexit__(self, *exc):
+                        return False
+                return Connection()
+
+        class Models:
+            async def generate_content(self, model, contents, config=None):
+                from google.genai import types
+                await asyncio.sleep(client.summary_delay_s)
+                return types.GenerateContentResponse(candidates=[types.Candidate(
+                    content=types.Content(role="model", parts=[types.Part(text=client.summary_text)]))])
+
+        self.aio = pytypes.SimpleNamespace(live=Live(), models=Models())
+
+
+class FakeWebSocket:
+    """Client side of one connection: queue messages in, collect frames out."""
+
+    def __init__(self, path="/"):
+        self.incoming = asyncio.Queue()
+        self.out = []
+        self.request = pytypes.SimpleNamespace(path=path, headers={})
+        self.path = path
+
+    def push(self, message):
+        self.incoming.put_nowait(message)
+
+    def hang_up(self):
+        self.incoming.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.incoming.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    async def send(self, message):
+        self.out.append(message)
+
+    async def close(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """The server module wired to a FakeClient, importable without credentials."""
+    from google import genai
+    from google.oauth2 import service_account
+    monkeypatch.setattr(service_account.Credentials, "from_service_account_file",
+                        staticmethod(lambda *a, **k: None))
+    monkeypatch.setattr(genai, "Client", FakeClient)
+    module = importlib.import_module("server")
+    monkeypatch.setattr(module, "client", FakeClient())
+    return module
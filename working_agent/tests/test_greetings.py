@@ -0,0 +1,45 @@
+import asyncio
+import os
+
+
+def write_clip(out_dir, text, pcm, mtime):
+    for suffix, data in ((".pcm", pcm), (".txt", text.encode("utf-8"))):
+        path = os.path.join(out_dir, "youthguide_puck_en" + suffix)
+        with open(path, "wb") as f:
+            f.write(data)
+        os.utime(path, (mtime, mtime))
+
+
+def test_regenerated_clip_replaces_the_cached_one(server, tmp_path):
+    import greetings
+
+    cache = greetings.GreetingCache(str(tmp_path))
+    write_clip(str(tmp_path), "Hi there!", b"\0" * 10, 1_000_000)
+
+    async def run():
+        before = await cache.get("youthguide", "Puck", "en")
+        write_clip(str(tmp_path), "Hello again!", b"\0" * 20, 2_000_000)
+        stale = await cache.get("youthguide", "Puck", "en")
+        cache.invalidate()  # what a config reload does
+        return before, stale, await cache.get("youthguide", "Puck", "en")
+
+    before, stale, after = asyncio.run(run())
+    assert before.text == stale.text == "Hi there!"  # listing not refreshed yet
+    assert after.text == "Hello again!"
+
+
+def test_rescan_reloads_a_clip_whose_files_changed(server, tmp_path, monkeypatch):
+    import greetings
+
+    monkeypatch.setattr(greetings, "RESCAN_INTERVAL_S", 0)
+    cache = greetings.GreetingCache(str(tmp_path))
+    write_clip(str(tmp_path), "Hi there!", b"\0" * 10, 1_000_000)
+
+    async def run():
+        before = await cache.get("youthguide", "Puck", "en")
+        write_clip(str(tmp_path), "Hello again!", b"\0" * 20, 2_000_000)
+        return before, await cache.get("youthguide", "Puck", "en")
+
+    before, after = asyncio.run(run())
+    assert before.text == "Hi there!" and after.text == "Hello again!"
+    assert len(after.frames) == 1
@@ -0,0 +1,26 @@
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logging_setup import ContextFilter, SamplingFilter, bind_log_context, reset_log_context  # noqa: E402
+
+
+def sampled_record(client_id):
+    token = bind_log_context(client_id=client_id)
+    try:
+        record = logging.LogRecord("common", logging.INFO, __file__, 0, "turn", (), None)
+        record.sample = "turn"
+        ContextFilter().filter(record)
+        return record
+    finally:
+        reset_log_context(token)
+
+
+def test_sampling_budget_is_per_connection():
+    sampler = SamplingFilter(limit=2, window_s=60)
+    busy = [sampler.filter(sampled_record(1)) for _ in range(5)]
+    quiet = [sampler.filter(sampled_record(2)) for _ in range(2)]
+    assert busy == [True, True, False, False, False]
+    assert quiet == [True, True]
@@ -0,0 +1,127 @@
+import asyncio
+import dataclasses
+import json
+
+from google.genai import types
+
+from conftest import FakeWebSocket
+
+
+def resumption(handle):
+    return types.LiveServerMessage(session_resumption_update=types.LiveServerSessionResumptionUpdate(
+        new_handle=handle, resumable=True))
+
+
+def text_turn(text):
+    return [
+        types.LiveServerMessage(server_content=types.LiveServerContent(
+            output_transcription=types.Transcription(text=text))),
+        types.LiveServerMessage(server_content=types.LiveServerContent(turn_complete=True),
+                                usage_metadata=types.UsageMetadata(prompt_token_count=100, response_token_count=20)),
+    ]
+
+
+def use_context_policy(server, monkeypatch, **policy):
+    """Make every persona snapshot use a context policy with these overrides."""
+    current = server.config_store.current
+
+    def patched(persona=server.DEFAULT_PERSONA):
+        live = current(persona)
+        if live is None:
+            return None
+        return dataclasses.replace(live, context_policy=dataclasses.replace(live.context_policy, **policy))
+    monkeypatch.setattr(server.config_store, "current", patched)
+
+
+async def wait_for(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def test_resume_after_rollover_does_not_reuse_pre_rollover_handle(server, monkeypatch):
+    use_context_policy(server, monkeypatch, compression=False, rollover_tokens=1)
+    monkeypatch.setattr(server, "IDLE_PARK_S", 0.2)
+    client = server.client
+    client.sessions = [
+        # The first turn starts the recap; the swap happens at the next turn boundary
+        [[resumption("H-hello")] + text_turn("Hello! How are you feeling today?")
+         + [0.05] + text_turn("Take your time.")],
+        [],  # idles, parks
+    ]
+
+    async def run():
+        srv = server.LiveAPIWebSocketServer()
+        ws = FakeWebSocket()
+        task = asyncio.create_task(srv.process_audio(ws, 1))
+        await wait_for(lambda: len(client.connects) == 2)
+        await wait_for(lambda: server.metrics.snapshot()["gauges"].get("live_sessions_parked") == 1)
+        ws.push(json.dumps({"type": "text", "data": "I'm back"}))
+        await wait_for(lambda: len(client.connects) == 3)
+        key = json.loads(ws.out[0])["data"]
+        stored = await srv.state_store.load(key)
+        ws.hang_up()
+        await asyncio.wait_for(task, 2)
+        return stored
+
+    stored = asyncio.run(run())
+    rolled_over, resumed = client.connects[1][1], client.connects[2][1]
+    assert rolled_over.session_resumption is None or rolled_over.session_resumption.handle is None
+    assert resumed.session_resumption is None or resumed.session_resumption.handle != "H-hello"
+    assert "Recap of the conversation so far." in resumed.system_instruction
+    assert stored.handle is None
+
+
+def test_rollover_waits_for_the_background_recap(server, monkeypatch):
+    use_context_policy(server, monkeypatch, compression=False, rollover_tokens=1)
+    monkeypatch.setattr(server, "IDLE_PARK_S", 0)
+    client = server.client
+    client.summary_delay_s = 0.3
+    client.sessions = [[text_turn("First answer.") + [0.05] + text_turn("Second answer.")
+                        + [0.5] + text_turn("Third answer.")]]
+
+    async def run():
+        srv = server.LiveAPIWebSocketServer()
+        ws = FakeWebSocket()
+        task = asyncio.create_task(srv.process_audio(ws, 1))
+        await asyncio.sleep(0.2)
+        connects_while_summarizing = len(client.connects)
+        await wait_for(lambda: len(client.connects) == 2)
+        ws.hang_up()
+        await asyncio.wait_for(task, 2)
+        return connects_while_summarizing
+
+    assert asyncio.run(run()) == 1
+    seeded = client.connects[1][1].system_instruction
+    assert "Recap of the conversation so far." in seeded
+    # Turns after the recap was started are carried over verbatim
+    assert "ASSISTANT: Second answer." in seeded and "ASSISTANT: Third answer." in seeded
+
+
+def test_only_server_issued_session_keys_restore_a_session(server, monkeypatch):
+    monkeypatch.setattr(server, "IDLE_PARK_S", 0)
+    client = server.client
+    client.sessions = [[text_turn("Hello!")], [], []]
+
+    async def connect(srv, path):
+        ws = FakeWebSocket(path)
+        task = asyncio.create_task(srv.process_audio(ws, 1))
+        await wait_for(lambda: ws.out)
+        key = json.loads(ws.out[0])["data"]
+        await asyncio.sleep(0.1)
+        ws.hang_up()
+        await asyncio.wait_for(task, 2)
+        return key
+
+    async def run():
+        srv = server.LiveAPIWebSocketServer()
+        issued = await connect(srv, "/")
+        await srv.state_store.flush()
+        resumed = await connect(srv, f"/?session={issued}")
+        forged = await connect(srv, "/?session=someone-elses-key")
+        return issued, resumed, forged, (await srv.state_store.load(forged)).transcript
+
+    issued, resumed, forged, forged_transcript = asyncio.run(run())
+    assert resumed == issued
+    assert forged != "someone-elses-key" and forged_transcript == []
@@ -0,0 +1,27 @@
+import asyncio
+import time
+
+
+def test_sqlite_store_purges_sessions_past_the_ttl(server, tmp_path):
+    import session_store
+
+    async def run():
+        store = session_store.SqliteSessionStore(str(tmp_path / "sessions.sqlite3"), ttl_s=60)
+        await store.start()
+        try:
+            for key in ("stale", "fresh"):
+                store.append_turn(key, {"role": "user", "text": "hi", "ts": "t"})
+            await store.flush()
+            with store._lock:
+                store._conn.execute("UPDATE sessions SET updated_at = ? WHERE session_key = 'stale'",
+                                    (time.time() - 120,))
+            await store.purge_expired()
+            leftover_turns = store._conn.execute(
+                "SELECT COUNT(*) FROM turns WHERE session_key = 'stale'").fetchone()[0]
+            return await store.load("stale"), await store.load("fresh"), leftover_turns
+        finally:
+            await store.close()
+
+    stale, fresh, leftover_turns = asyncio.run(run())
+    assert stale is None and leftover_turns == 0
+    assert fresh is not None and len(fresh.transcript) == 1
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import summarizer_routing  # noqa: E402
+from summarizer_routing import SummarizerRouter  # noqa: E402
+
+
+def stub_call(latencies):
+    async def call(model):
+        await asyncio.sleep(latencies[model])
+        return model
+    return call
+
+
+def test_slowed_primary_drops_in_ranking(monkeypatch):
+    monkeypatch.setattr(summarizer_routing, "HEDGE_MIN_S", 0.01)
+    router = SummarizerRouter()
+    latencies = {"A": 0.02, "B": 0.02}
+
+    async def run():
+        for _ in range(10):
+            assert (await router.generate(["A", "B"], stub_call(latencies)))[0] == "A"
+        latencies["A"] = 1.0
+        winners = [(await router.generate(["A", "B"], stub_call(latencies)))[0] for _ in range(10)]
+        return winners
+
+    winners = asyncio.run(run())
+    assert set(winners) == {"B"}
+    assert router.ranked(["A", "B"]) == ["B", "A"]
+
+
+def test_late_hedge_loser_is_not_recorded(monkeypatch):
+    monkeypatch.setattr(summarizer_routing, "HEDGE_MIN_S", 0.01)
+    router = SummarizerRouter()
+
+    async def run():
+        for _ in range(5):
+            await router.generate(["A", "B"], stub_call({"A": 0.02, "B": 0.02}))
+        # A is a bit slow: the hedge to B starts, then A wins before B answers
+        return await router.generate(["A", "B"], stub_call({"A": 0.04, "B": 1.0}))
+
+    assert asyncio.run(run())[0] == "A"
+    assert len(router.stats["B"].latencies) == 0
@@ -0,0 +1,30 @@
+import asyncio
+
+
+class FakeIndex:
+    def __init__(self):
+        self.profiles = {}
+        self.lookups = 0
+
+    def lookup(self, user_id):
+        self.lookups += 1
+        return self.profiles.get(user_id)
+
+
+def test_cached_misses_expire_so_a_new_profile_is_found(server):
+    import user_memory
+
+    index = FakeIndex()
+    memory = user_memory.UserMemory(index, budget_ms=1000, ttl_s=60, miss_ttl_s=0.05)
+
+    async def run():
+        first = await memory.get("u1")
+        index.profiles["u1"] = "profile"
+        cached = await memory.get("u1")
+        await asyncio.sleep(0.1)
+        return first, cached, await memory.get("u1"), await memory.get("u1")
+
+    first, cached, refreshed, again = asyncio.run(run())
+    assert (first, cached) == (None, None)
+    assert refreshed == again == "profile"
+    assert index.lookups == 2
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from google.genai import types
+
+from common import logger, get_order_status
+from metrics import metrics
+
+
+class TTLCache:
+    """Small LRU cache whose entries also expire after `ttl_s` seconds."""
+
+    def __init__(self, maxsize: int = 256, ttl_s: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._data = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl_s, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+@dataclass
+class RegisteredTool:
+    declaration: types.FunctionDeclaration
+    func: Callable[..., Any]
+    timeout_s: float = 10.0
+    cache: Optional[TTLCache] = None   # only for deterministic tools
+
+
+class ToolRuntime:
+    """
+    Holds the tools declared to the Live session and executes its tool calls.
+    Calls from one tool_call message run concurrently; sync functions go to a
+    thread pool so they never block the event loop.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self.tools = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+
+    def register(self, declaration: types.FunctionDeclaration, func, timeout_s: float = 10.0,
+                 cacheable: bool = False, cache_size: int = 256, cache_ttl_s: float = 300.0):
+        cache = TTLCache(cache_size, cache_ttl_s) if cacheable else None
+        self.tools[declaration.name] = RegisteredTool(declaration, func, timeout_s, cache)
+
+    def declarations(self, names=None) -> list:
+        """Tool list for LiveConnectConfig; optionally restricted to `names`."""
+        decls = [t.declaration for n, t in self.tools.items() if names is None or n in names]
+        return [types.Tool(function_declarations=decls)] if decls else []
+
+    async def _invoke(self, tool: RegisteredTool, args: dict):
+        if asyncio.iscoroutinefunction(tool.func):
+            return await tool.func(**args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: tool.func(**args))
+
+    async def _run_call(self, call) -> types.FunctionResponse:
+        name = call.name
+        args = dict(call.args or {})
+        tool = self.tools.get(name)
+        if tool is None:
+            logger.warning(f"Model called unknown tool: {name}")
+            return types.FunctionResponse(id=call.id, name=name, response={"error": f"unknown tool '{name}'"})
+
+        cache_key = None
+        if tool.cache is not None:
+            cache_key = json.dumps(args, sort_keys=True, default=str)
+            cached = tool.cache.get(cache_key)
+            if cached is not None:
+                metrics.incr(f"tool_cache_hits.{name}")
+                return types.FunctionResponse(id=call.id, name=name, response={"result": cached})
+
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._invoke(tool, args), timeout=tool.timeout_s)
+            response = {"result": result}
+            if cache_key is not None:
+                tool.cache.put(cache_key, result)
+        except asyncio.TimeoutError:
+            metrics.incr(f"tool_timeouts.{name}")
+            logger.warning(f"Tool '{name}' timed out after {tool.timeout_s}s")
+            response = {"error": f"tool '{name}' timed out"}
+        except Exception as e:
+            metrics.incr(f"tool_errors.{name}")
+            logger.error(f"Tool '{name}' failed: {e}")
+            response = {"error": str(e)}
+        finally:
+            metrics.observe(f"tool_latency.{name}", (time.monotonic() - started) * 1000)
+        return types.FunctionResponse(id=call.id, name=name, response=response)
+
+    async def handle_tool_call(self, tool_call) -> list:
+        """Execute every function call in a Live `tool_call` message concurrently."""
+        calls = tool_call.function_calls or []
+        return list(await asyncio.gather(*(self._run_call(c) for c in calls)))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------- Built-in tools ----------
+get_order_status_declaration = types.FunctionDeclaration(
+    name="get_order_status",
+    description="Retrieve the current status of a customer order by its order ID.",
+    parameters=types.Schema(
+        type="OBJECT",
+        properties={
+            "order_id": types.Schema(type="STRING", description="The order ID, e.g. SH1005."),
+        },
+        required=["order_id"],
+    ),
+)
+
+
+def build_default_runtime() -> ToolRuntime:
+    runtime = ToolRuntime()
+    # Deterministic per order id, so results can be cached
+    runtime.register(get_order_status_declaration, get_order_status, timeout_s=5.0, cacheable=True)
+    return runtime
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+
+from common import logger
+from metrics import metrics
+
+USAGE_DIR = os.path.join(os.path.dirname(__file__), "data", "usage")
+HOURS_KEPT = 48
+# Log a warning once when a single session goes past this many tokens
+RUNAWAY_SESSION_TOKENS = 2_000_000
+
+FIELDS = ("input_tokens", "output_tokens", "total_tokens", "calls")
+
+
+def _empty():
+    return [0, 0, 0, 0]
+
+
+def _as_dict(row) -> dict:
+    return dict(zip(FIELDS, row))
+
+
+def usage_counts(usage):
+    """
+    Normalize usage metadata from a Live message or a generate_content result
+    into (input, output, total). Returns None if nothing was reported.
+    """
+    if usage is None:
+        return None
+    prompt = getattr(usage, "prompt_token_count", None) or 0
+    output = (getattr(usage, "response_token_count", None)
+              or getattr(usage, "candidates_token_count", None) or 0)
+    total = getattr(usage, "total_token_count", None) or (prompt + output)
+    if not (prompt or output or total):
+        return None
+    return prompt, output, total
+
+
+class UsageAccounting:
+    """
+    In-memory token totals per session, per model and per UTC hour. Updated
+    from the event loop only, so plain lists are enough.
+    """
+
+    def __init__(self, runaway_tokens: int = RUNAWAY_SESSION_TOKENS):
+        self.runaway_tokens = runaway_tokens
+        self.by_session = {}   # session -> {model -> row}
+        self.by_model = {}     # model -> row
+        self.by_hour = {}      # "YYYY-MM-DDTHH" -> {model -> row}
+        self._flagged = set()
+
+    @staticmethod
+    def _add(row, counts):
+        row[0] += counts[0]
+        row[1] += counts[1]
+        row[2] += counts[2]
+        row[3] += 1
+
+    def record(self, session, model: str, usage):
+        counts = usage_counts(usage)
+        if counts is None:
+            return
+        hour = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H")
+        self._add(self.by_session.setdefault(session, {}).setdefault(model, _empty()), counts)
+        self._add(self.by_model.setdefault(model, _empty()), counts)
+        self._add(self.by_hour.setdefault(hour, {}).setdefault(model, _empty()), counts)
+        metrics.incr(f"tokens_total.{model}", counts[2])
+
+        if session not in self._flagged:
+            total = sum(r[2] for r in self.by_session[session].values())
+            if total >= self.runaway_tokens:
+                self._flagged.add(session)
+                metrics.incr("runaway_sessions")
+                logger.warning(f"Session {session} has used {total} tokens (runaway threshold {self.runaway_tokens})")
+
+    def session_totals(self, session) -> dict:
+        models = self.by_session.get(session, {})
+        overall = _empty()
+        for row in models.values():
+            for i in range(len(FIELDS)):
+                overall[i] += row[i]
+        return {
+            "total": _as_dict(overall),
+            "by_model": {m: _as_dict(r) for m, r in models.items()},
+        }
+
+    def forget_session(self, session):
+        self.by_session.pop(session, None)
+        self._flagged.discard(session)
+
+    def snapshot(self) -> dict:
+        hours = sorted(self.by_hour)
+        for old in hours[:-HOURS_KEPT]:
+            del self.by_hour[old]
+        return {
+            "exported_at_utc": datetime.now(timezone.utc).isoformat(),
+            "by_model": {m: _as_dict(r) for m, r in self.by_model.items()},
+            "by_hour": {h: {m: _as_dict(r) for m, r in models.items()}
+                        for h, models in self.by_hour.items()},
+            "active_sessions": {str(s): self.session_totals(s)["total"] for s in self.by_session},
+        }
+
+    async def export_periodically(self, interval_s: float = 300.0, out_dir: str = USAGE_DIR):
+        """Background task: append a snapshot to data/usage/usage_YYYYMMDD.jsonl."""
+        while True:
+            await asyncio.sleep(interval_s)
+            snapshot = self.snapshot()
+            day = datetime.now(timezone.utc).strftime("%Y%m%d")
+            path = os.path.join(out_dir, f"usage_{day}.jsonl")
+            try:
+                await asyncio.to_thread(_append_jsonl, path, snapshot)
+            except Exception as e:
+                logger.error(f"Usage export failed: {e}")
+
+
+def _append_jsonl(path: str, obj: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n")
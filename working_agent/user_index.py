@@ -0,0 +1,239 @@
+"""
+Precomputed returning-user profiles, one row per stable user id, folded from
+the user's most recent session summaries (data/summaries/*.json).
+
+    python user_index.py                 # rebuild data/user_index.sqlite3 from scratch
+
+The server keeps the index current by folding in each new summary as it is
+saved. Standalone on purpose: it does not import common.py, so it needs no
+credentials.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger("common")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SUMMARIES_DIR = os.path.join(BASE_DIR, "data", "summaries")
+USER_INDEX_PATH = os.environ.get("USER_INDEX_PATH", os.path.join(BASE_DIR, "data", "user_index.sqlite3"))
+# Sessions per user folded into the profile, and items kept per list
+RECENT_SESSIONS = 5
+PROFILE_ITEMS = 6
+
+# Client-supplied user ids are used as index keys, so keep them tame
+USER_ID_RE = re.compile(r"^[A-Za-z0-9_-]{4,64}$")
+
+
+@dataclass(frozen=True)
+class UserProfile:
+    """Compact memory of a returning user, built from their recent session summaries."""
+    user_id: str
+    sessions: int
+    last_seen_utc: str
+    name: str = ""
+    last_summary: str = ""
+    themes: tuple = ()
+    goals: tuple = ()
+    coping: tuple = ()
+
+    def instruction(self) -> str:
+        """Tells the Live session what it already knows about this user."""
+        lines = [
+            f"RETURNING USER: you have talked with this user {self.sessions} time(s) before "
+            f"(last on {self.last_seen_utc[:10]}). Greet them as someone you know; do not ask "
+            "again for things listed here, but gently check whether they still hold."
+        ]
+        if self.name:
+            lines.append(f"- Name: {self.name}")
+        if self.last_summary:
+            lines.append(f"- Last conversation: {self.last_summary}")
+        if self.themes:
+            lines.append(f"- Recent themes: {', '.join(self.themes)}")
+        if self.goals:
+            lines.append(f"- Goals and hopes: {', '.join(self.goals)}")
+        if self.coping:
+            lines.append(f"- Coping strategies discussed: {', '.join(self.coping)}")
+        return "\n".join(lines)
+
+
+# ---------- Building profiles ----------
+def session_entry(payload: dict) -> Optional[dict]:
+    """The few summary fields a profile needs, from one saved wellness summary file."""
+    meta = payload.get("meta") or {}
+    if meta.get("summary_kind", "wellness") != "wellness":
+        return None  # other personas' summaries carry none of these fields
+    summary = payload.get("summary")
+    if not isinstance(summary, dict) or "raw" in summary:
+        return None
+    return {
+        # A session summarized more than once (repeated "end", restored sessions) counts once
+        "session_key": meta.get("session_ref") or meta.get("session_key") or meta.get("saved_at_utc", ""),
+        "saved_at_utc": meta.get("saved_at_utc", ""),
+        "name": summary.get("preferred_name") or "",
+        "summary": summary.get("summary") or "",
+        "themes": summary.get("emotions_themes") or [],
+        "goals": summary.get("goals_or_hopes") or [],
+        "coping": summary.get("coping_strategies_discussed") or [],
+    }
+
+
+def _recent_unique(entries: list, key: str) -> list:
+    seen, items = set(), []
+    for entry in entries:
+        for item in entry[key]:
+            text = str(item).strip()
+            if text and text.lower() not in seen:
+                seen.add(text.lower())
+                items.append(text)
+    return items[:PROFILE_ITEMS]
+
+
+def build_profile(user_id: str, entries: list, sessions: int) -> dict:
+    """Fold session entries (newest first) into the stored profile."""
+    return {
+        "user_id": user_id,
+        "sessions": sessions,
+        "last_seen_utc": entries[0]["saved_at_utc"] if entries else "",
+        "name": next((e["name"] for e in entries if e["name"]), ""),
+        "last_summary": entries[0]["summary"] if entries else "",
+        "themes": _recent_unique(entries, "themes"),
+        "goals": _recent_unique(entries, "goals"),
+        "coping": _recent_unique(entries, "coping"),
+    }
+
+
+class UserIndex:
+    """
+    SQLite index of one precomputed profile per user id, so a connect-time
+    lookup is a single primary-key read instead of a scan of the summaries.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS profiles (
+            user_id    TEXT PRIMARY KEY,
+            profile      TEXT NOT NULL,
+            recent       TEXT NOT NULL,
+            session_keys TEXT NOT NULL,
+            updated_at   REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = USER_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, user_id: str) -> Optional[UserProfile]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT profile FROM profiles WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        profile = json.loads(row[0])
+        for key in ("themes", "goals", "coping"):
+            profile[key] = tuple(profile.get(key) or ())
+        return UserProfile(**profile)
+
+    def add_session(self, user_id: str, payload: dict):
+        """Fold one new summary into the user's profile, replacing an earlier one of the same session."""
+        entry = session_entry(payload)
+        if entry is None:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT recent, session_keys FROM profiles WHERE user_id = ?", (user_id,)
+                ).fetchone()
+                recent, session_keys = (json.loads(row[0]), json.loads(row[1])) if row else ([], [])
+                key = entry["session_key"]
+                recent = [entry] + [e for e in recent if e.get("session_key") != key]
+                if key not in session_keys:
+                    session_keys.append(key)
+                self._write(conn, user_id, recent[:RECENT_SESSIONS], session_keys)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def rebuild(self, summaries_dir: str = SUMMARIES_DIR) -> int:
+        """Recompute every profile from the summary files; returns the number of users."""
+        by_user = {}
+        for name in os.listdir(summaries_dir) if os.path.isdir(summaries_dir) else []:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(summaries_dir, name), "r", encoding="utf-8") as f:
+                    payload = json.load(f)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable summary {name}: {e}")
+                continue
+            user_id = (payload.get("meta") or {}).get("user_id")
+            entry = session_entry(payload)
+            if user_id and entry:
+                sessions = by_user.setdefault(user_id, {})
+                earlier = sessions.get(entry["session_key"])
+                if earlier is None or earlier["saved_at_utc"] <= entry["saved_at_utc"]:
+                    sessions[entry["session_key"]] = entry
+
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM profiles")
+                for user_id, sessions in by_user.items():
+                    entries = sorted(sessions.values(), key=lambda e: e["saved_at_utc"], reverse=True)
+                    self._write(conn, user_id, entries[:RECENT_SESSIONS], list(sessions))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return len(by_user)
+
+    @staticmethod
+    def _write(conn, user_id, recent, session_keys):
+        profile = build_profile(user_id, recent, len(session_keys))
+        conn.execute(
+            "INSERT OR REPLACE INTO profiles (user_id, profile, recent, session_keys, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (user_id, json.dumps(profile, ensure_ascii=False), json.dumps(recent, ensure_ascii=False),
+             json.dumps(session_keys), time.time()),
+        )
+
+    def close(self):
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the returning-user profile index from saved summaries.")
+    parser.add_argument("--summaries-dir", default=SUMMARIES_DIR)
+    parser.add_argument("--index", default=USER_INDEX_PATH)
+    args = parser.parse_args()
+    index = UserIndex(args.index)
+    started = time.monotonic()
+    users = index.rebuild(args.summaries_dir)
+    index.close()
+    print(f"Indexed {users} user(s) into {args.index} in {time.monotonic() - started:.2f}s", file=sys.stderr)
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from common import logger
+from metrics import metrics
+from user_index import UserIndex, UserProfile
+
+# Connect-time lookup budget; a slower lookup starts the session without a profile
+USER_MEMORY_BUDGET_MS = float(os.environ.get("USER_MEMORY_BUDGET_MS", "5"))
+USER_MEMORY_LRU_SIZE = 1024
+# Cached profiles go stale once another worker saves a summary for the user;
+# misses expire sooner, since a new user's first summary creates the profile
+USER_MEMORY_TTL_S = 300.0
+USER_MEMORY_MISS_TTL_S = 30.0
+
+
+class UserMemory:
+    """
+    Connect-time profile lookup: an in-memory LRU (misses cached too, for less
+    long) in front of the UserIndex, bounded by a latency budget so session
+    setup never waits on disk. A lookup that overruns still fills the LRU for
+    the next connect.
+    """
+
+    def __init__(self, index: Optional[UserIndex] = None, budget_ms: float = USER_MEMORY_BUDGET_MS,
+                 max_entries: int = USER_MEMORY_LRU_SIZE, ttl_s: float = USER_MEMORY_TTL_S,
+                 miss_ttl_s: float = USER_MEMORY_MISS_TTL_S):
+        self.index = index or UserIndex()
+        self.budget_ms = budget_ms
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.miss_ttl_s = miss_ttl_s
+        self._cache = OrderedDict()  # user_id -> (Optional[UserProfile], monotonic expiry)
+        self._lock = threading.Lock()
+
+    async def start(self):
+        # Open the index up front so the first lookup does not pay for it
+        await asyncio.to_thread(self.index._connection)
+
+    def _remember(self, user_id, profile):
+        with self._lock:
+            ttl = self.ttl_s if profile is not None else self.miss_ttl_s
+            self._cache[user_id] = (profile, time.monotonic() + ttl)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _lookup(self, user_id):
+        profile = self.index.lookup(user_id)
+        self._remember(user_id, profile)
+        return profile
+
+    async def get(self, user_id: str) -> Optional[UserProfile]:
+        started = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(user_id)
+            if cached is not None:
+                profile, expires = cached
+                if started < expires:
+                    self._cache.move_to_end(user_id)
+                    metrics.incr("user_memory_hits")
+                    return profile
+                del self._cache[user_id]
+        metrics.incr("user_memory_misses")
+        try:
+            profile = await asyncio.wait_for(asyncio.to_thread(self._lookup, user_id), self.budget_ms / 1000)
+        except asyncio.TimeoutError:
+            metrics.incr("user_memory_timeouts")
+            logger.warning(f"User profile lookup exceeded {self.budget_ms:g} ms; continuing without it")
+            return None
+        except Exception as e:
+            metrics.incr("user_memory_errors")
+            logger.error(f"User profile lookup failed: {e}")
+            return None
+        metrics.observe("user_memory_lookup", (time.monotonic() - started) * 1000)
+        return profile
+
+    async def record_summary(self, user_id: str, payload: dict):
+        """Fold a freshly saved summary into the index and refresh the cached profile."""
+        await asyncio.to_thread(self.index.add_session, user_id, payload)
+        await asyncio.to_thread(self._lookup, user_id)
+
+    def close(self):
+        self.index.close()
@@ -0,0 +1,64 @@
+"""
+Signed user tokens for returning-user memory. The app that knows who the user
+is mints a token with the shared USER_TOKEN_SECRET; the server trusts only a
+user id whose token it can verify, so a guessed id never loads a profile.
+
+    USER_TOKEN_SECRET=... python user_tokens.py <user_id> [--ttl-hours 24]
+
+Format: <user_id>.<expires_unix>.<hex HMAC-SHA256 of "<user_id>.<expires_unix>">
+
+Standalone on purpose: it does not import common.py, so it needs no credentials.
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import time
+from typing import Optional
+
+from user_index import USER_ID_RE
+
+# Shared secret for user tokens; unset disables returning-user memory entirely
+USER_TOKEN_SECRET = os.environ.get("USER_TOKEN_SECRET")
+DEFAULT_TTL_S = 24 * 3600
+
+
+def _signature(secret: str, user_id: str, expires: int) -> str:
+    return hmac.new(secret.encode("utf-8"), f"{user_id}.{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def sign_user_token(user_id: str, ttl_s: float = DEFAULT_TTL_S, secret: Optional[str] = None) -> str:
+    secret = secret or USER_TOKEN_SECRET
+    if not secret:
+        raise ValueError("USER_TOKEN_SECRET is not set")
+    if not USER_ID_RE.match(user_id):
+        raise ValueError(f"Invalid user id {user_id!r}")
+    expires = int(time.time() + ttl_s)
+    return f"{user_id}.{expires}.{_signature(secret, user_id, expires)}"
+
+
+def verify_user_token(token, secret: Optional[str] = None) -> Optional[str]:
+    """The user id of a valid, unexpired token, else None."""
+    secret = secret or USER_TOKEN_SECRET
+    if not secret or not isinstance(token, str):
+        return None
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    user_id, expires, signature = parts
+    if not USER_ID_RE.match(user_id) or not expires.isdigit() or int(expires) < time.time():
+        return None
+    if not hmac.compare_digest(signature, _signature(secret, user_id, int(expires))):
+        return None
+    return user_id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mint a signed user token for returning-user memory.")
+    parser.add_argument("user_id")
+    parser.add_argument("--ttl-hours", type=float, default=DEFAULT_TTL_S / 3600)
+    args = parser.parse_args()
+    try:
+        print(sign_user_token(args.user_id, args.ttl_hours * 3600))
+    except ValueError as e:
+        parser.exit(2, f"{e}\n")